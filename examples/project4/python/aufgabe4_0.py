@@ -6,6 +6,7 @@ from time import process_time
 sys.path.append("../../..")
 from hopfieldnetwork import HopfieldNetwork
 from hopfieldnetwork import images2xi, plot_network_development, DATA_DIR
+from hopfieldnetwork.generators import flip_exact
 
 timer = process_time()
 
@@ -48,8 +49,7 @@ plot_network_development(
 ## Test: Bildrekonstruktion aus verrauschtem Bild
 # Setze 'verrauschten' Hilbert als Startkonfiguartion
 hilbert = np.copy(xi[:, 1])
-faded_hilbert = np.copy(xi[:, 1])
-faded_hilbert[np.random.choice(N, int(N / 4))] *= -1
+faded_hilbert = flip_exact(xi[:, 1], int(N / 4))
 hopfield_network.set_initial_neurons_state(np.copy(faded_hilbert))
 # Plotte Neuronenkonfiguartion fuer 3 Zeitschritte
 plot_network_development(
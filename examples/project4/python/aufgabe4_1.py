@@ -5,8 +5,10 @@ import numpy as np
 
 sys.path.append("../../..")
 from hopfieldnetwork import HopfieldNetwork
+from hopfieldnetwork.generators import random_patterns
 
 timer = process_time()
+rng = np.random.default_rng()
 
 ### 4.1 Berechnung der Fehlerrate fuer 100 Neuronen
 print("4.1 Berechnung der Fehlerrate fuer 100 Neuronen fuer p/N:")
@@ -24,7 +26,7 @@ for i, p in enumerate(p_vec):
     t_steps = np.zeros(2)
     for j in range(N_statistic):
         hopfield_network = HopfieldNetwork(N=N)
-        hopfield_network.train_pattern(2 * np.random.randint(2, size=(N, p)) - 1)
+        hopfield_network.train_pattern(random_patterns(N, p, rng))
         for k in range(p):
             # Async: Fehlerrate nach einer Iteration
             hopfield_network.set_initial_neurons_state(
@@ -5,9 +5,10 @@ import numpy as np
 
 sys.path.append("../../..")
 from hopfieldnetwork import HopfieldNetwork
-
+from hopfieldnetwork.generators import random_patterns
 
 timer = process_time()
+rng = np.random.default_rng()
 
 ### 4.2 Spurious states
 print("4.2.1 Spurious states")
@@ -24,18 +25,12 @@ N_statistic2 = int(sys.argv[2]) if len(sys.argv) > 2 else 1  # comandline argume
 for i, p in enumerate(p_vec):
     for j in range(N_statistic1):
         hopfield_network = HopfieldNetwork(N=N)
-        hopfield_network.train_pattern(2 * np.random.randint(2, size=(N, p)) - 1)
+        hopfield_network.train_pattern(random_patterns(N, p, rng))
         for j2 in range(N_statistic2):
-            hopfield_network.set_initial_neurons_state(
-                2 * np.random.randint(2, size=N) - 1
-            )
+            hopfield_network.set_initial_neurons_state(random_patterns(N, rng=rng))
             hopfield_network.update_neurons(0, "async", run_max=True)
-            d = np.sum(
-                hopfield_network.S.reshape(hopfield_network.N, 1)
-                != hopfield_network.xi,
-                axis=0,
-            )
-            P_spurious_states[i] += np.min((d, N - d)) / N > 0.05
+            _, d = hopfield_network.nearest_pattern(hopfield_network.S, inverse=True)
+            P_spurious_states[i] += d / N > 0.05
 P_spurious_states /= N_statistic1 * N_statistic2
 
 np.savez(
@@ -5,8 +5,10 @@ import numpy as np
 
 sys.path.append("../../..")
 from hopfieldnetwork import HopfieldNetwork
+from hopfieldnetwork.generators import random_patterns
 
 timer = process_time()
+rng = np.random.default_rng()
 
 ### 4.2 Endliche Temperaturen
 print("4.2.2 Endliche Temperaturen")
@@ -25,31 +27,21 @@ for i, p in enumerate(p_vec):
     print(p / N, end=" ", flush=True)
     for j in range(N_statistic1):
         hopfield_network = HopfieldNetwork(N=N)
-        hopfield_network.train_pattern(2 * np.random.randint(2, size=(N, p)) - 1)
-        initial_pattern = 2 * np.random.randint(2, size=N) - 1
-        for j in range(N_statistic2):
-            # update without finite temperatures
-            hopfield_network.set_initial_neurons_state(np.copy(initial_pattern))
-            hopfield_network.update_neurons(iterations, "async")
-            d = np.sum(
-                hopfield_network.S.reshape(hopfield_network.N, 1)
-                != hopfield_network.xi,
-                axis=0,
-            )
-            P_spurious_states[i, 0] += np.min((d, N - d)) / N > 0.05
-
-            # update with finite temperatures
-            for k, beta in enumerate(beta_vec):
-                hopfield_network.set_initial_neurons_state(np.copy(initial_pattern))
-                hopfield_network.update_neurons_with_finite_temp(
-                    iterations, "async", beta=beta
-                )
-                d = np.sum(
-                    hopfield_network.S.reshape(hopfield_network.N, 1)
-                    != hopfield_network.xi,
-                    axis=0,
-                )
-                P_spurious_states[i, 1 + k] += np.min((d, N - d)) / N > 0.05
+        hopfield_network.train_pattern(random_patterns(N, p, rng))
+        initial_pattern = random_patterns(N, rng=rng)
+        # update without finite temperatures
+        result = hopfield_network.recall_batch(
+            np.tile(initial_pattern, (N_statistic2, 1)), "async", iterations
+        )
+        _, d = hopfield_network.nearest_pattern(result.S, inverse=True)
+        P_spurious_states[i, 0] += np.sum(d / N > 0.05)
+
+        # update with finite temperatures, all beta and repetitions at once
+        result = hopfield_network.simulate_replicas(
+            initial_pattern, beta_vec, iterations, "async", n_replicas=N_statistic2
+        )
+        _, d = hopfield_network.nearest_pattern(result.S, inverse=True)
+        P_spurious_states[i, 1:] += np.sum(d / N > 0.05, axis=1)
 
 P_spurious_states /= N_statistic1 * N_statistic2
 
@@ -1,6 +1,68 @@
+import importlib
+import os
 from .__about__ import __version__
-from .utils import *
 from .libary import *
+from .modern import ModernHopfieldNetwork
+from .instrumentation import Instrumentation, JSONLinesSink
+from .cache import RecallCache
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DATA_DIR = os.path.join(os.path.dirname(BASE_DIR), "data")
+
+# The image, plotting and GUI helpers import PIL, matplotlib and Tk, which
+# takes longer than everything else. They are imported on first access, so
+# headless workers only load NumPy and the network itself.
+LAZY_ATTRIBUTES = {
+    "AttrDict": "utils",
+    "image2numpy_array": "utils",
+    "gray_threshold": "utils",
+    "image2pattern": "utils",
+    "images2xi": "utils",
+    "images2network_file": "utils",
+    "plot_network_development": "utils",
+    "start_gui": "gui",
+}
+# names of "from hopfieldnetwork import *", the lazy ones are imported then,
+# except for the GUI which needs Tk
+__all__ = [
+    "BASE_DIR",
+    "DATA_DIR",
+    "DenseWeights",
+    "EXTENSION",
+    "HopfieldNetwork",
+    "Instrumentation",
+    "JSONLinesSink",
+    "LEARNING_RULES",
+    "LOWRANK_MAX_LOAD",
+    "LowRankWeights",
+    "ModernHopfieldNetwork",
+    "RecallCache",
+    "RecallResult",
+    "ReplicaResult",
+    "SparseWeights",
+    "async_sweep",
+    "construct_hebb_matrix",
+    "glauber_threshold",
+    "hamming_distance",
+    "is_network_file",
+    "lattice_connectivity",
+    "load_network_file",
+    "nearest_pattern",
+    "pack_states",
+    "random_connectivity",
+    "save_network_file",
+    "sign_0",
+    "unpack_states",
+] + sorted(name for name, module in LAZY_ATTRIBUTES.items() if module != "gui")
+
+
+def __getattr__(name):
+    if name not in LAZY_ATTRIBUTES:
+        raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
+    module = importlib.import_module("." + LAZY_ATTRIBUTES[name], __name__)
+    value = globals()[name] = getattr(module, name)
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(LAZY_ATTRIBUTES))
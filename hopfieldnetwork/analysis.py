@@ -0,0 +1,86 @@
+from __future__ import division
+from collections import namedtuple
+import numpy as np
+from .generators import noisy_probes
+from .libary import sign_0
+from .weights import BLOCK_BYTES
+
+# Health checks of a trained network for all saved patterns at once: the
+# stability of the patterns from one matrix product of the weights with xi,
+# and the sizes of their basins of attraction from batched recalls of noisy
+# probes.
+
+# stable (p,): pattern is a fixed point, min_margin (p,): smallest h_i xi_i,
+# n_unstable (p,): neurons with the wrong sign, margins (N, p): h_i xi_i
+StabilityResult = namedtuple(
+    "StabilityResult", ["stable", "min_margin", "n_unstable", "margins"]
+)
+# recall_rate (p, D): fraction of probes at Hamming distance distances[d]
+# which end in the pattern (nan if not tested), radius (p,): largest distance
+# up to which the rate stays at least the threshold
+BasinResult = namedtuple("BasinResult", ["distances", "recall_rate", "radius"])
+
+
+def stability_margins(hopfield_network):
+    # Stability margins h_i xi_i of all neurons of all saved patterns with the
+    # local fields h of the patterns, computed as one matrix product per block
+    # of patterns. A pattern is stable if sign_0(h) equals the pattern, the
+    # same condition as HopfieldNetwork.check_stability.
+    N, p = hopfield_network.N, hopfield_network.p
+    weights = hopfield_network.weights
+    margins = np.empty((N, p))
+    stable = np.empty(p, dtype="bool")
+    n_unstable = np.empty(p, dtype="int64")
+    n_patterns = max(1, BLOCK_BYTES // (8 * N))
+    for a in range(0, p, n_patterns):
+        xi = hopfield_network.xi[:, a : a + n_patterns]
+        h = weights.local_field(xi.T, hopfield_network.xi)  # (patterns, N)
+        wrong = sign_0(h) != xi.T
+        n_unstable[a : a + n_patterns] = np.sum(wrong, axis=1)
+        stable[a : a + n_patterns] = n_unstable[a : a + n_patterns] == 0
+        margins[:, a : a + n_patterns] = weights.scale * (h * xi.T).T
+    return StabilityResult(stable, margins.min(axis=0), n_unstable, margins)
+
+
+def basin_sizes(
+    hopfield_network,
+    distances=None,
+    n_probes=10,
+    mode="sync",
+    max_iterations=100,
+    threshold=0.5,
+    seed=None,
+):
+    # Estimates the basin of attraction of every saved pattern: at every
+    # Hamming distance of distances (increasing, default 0, N/20, ... N/2)
+    # n_probes noisy probes per pattern are recalled in one batch and counted
+    # if they end exactly in the pattern. Patterns whose recall rate fell
+    # below threshold are not probed at larger distances.
+    N, p = hopfield_network.N, hopfield_network.p
+    if distances is None:
+        distances = np.unique(np.linspace(0, N // 2, 11).astype("int64"))
+    distances = np.asarray(distances, dtype="int64")
+    rng = np.random.default_rng(seed)
+    recall_rate = np.full((p, distances.size), np.nan)
+    radius = np.full(p, -1, dtype="int64")  # -1: not even the pattern itself
+    active = np.arange(p)  # patterns still inside their basin
+    usage = np.copy(hopfield_network.usage)  # probes are no uses of patterns
+    n_patterns = max(1, BLOCK_BYTES // N // n_probes)  # patterns per recall
+    for d, distance in enumerate(distances):
+        if active.size == 0:
+            break
+        recalled = np.empty(active.size * n_probes, dtype="bool")
+        for a in range(0, active.size, n_patterns):
+            xi = hopfield_network.xi[:, active[a : a + n_patterns]]
+            probes = noisy_probes(xi, n_probes, distance, rng)
+            S = hopfield_network.recall_batch(probes, mode, max_iterations).S
+            recalled[a * n_probes : a * n_probes + probes.shape[0]] = np.all(
+                S == np.repeat(xi.T, n_probes, axis=0), axis=1
+            )
+        rate = recalled.reshape(active.size, n_probes).mean(axis=1)
+        recall_rate[active, d] = rate
+        inside = rate >= threshold
+        radius[active[inside]] = distance
+        active = active[inside]
+    hopfield_network.usage[:] = usage
+    return BasinResult(distances, recall_rate, radius)
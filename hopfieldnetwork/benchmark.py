@@ -0,0 +1,339 @@
+from __future__ import division, print_function
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+from PIL import Image
+from .__about__ import __version__
+from .generators import flip_exact, random_patterns, stream
+from .libary import HopfieldNetwork
+from .utils import images2xi
+
+# Benchmarks of the network operations for several sizes N and loads p / N:
+#
+#   python -m hopfieldnetwork.benchmark --sizes 100 1000 --output new.json
+#   python -m hopfieldnetwork.benchmark --compare old.json --output new.json
+#
+# Every benchmark is a function of (N, p, rng, directory) which prepares its
+# inputs (files go to the temporary directory) and returns a function doing
+# the measured work. That function returns the amount of work done in the
+# unit of the benchmark, e.g. neuron updates, so the throughput is comparable
+# between sizes. Like timeit.autorange, every repeat calls run() (each time
+# with freshly prepared inputs, only run() is timed) until the measured time
+# reaches MIN_TIME, so fast operations are averaged over many calls. The wall
+# time is the minimum over the repeats of the mean time per call, the peak
+# memory is measured with tracemalloc in an extra run (numpy reports its
+# array allocations to tracemalloc).
+#
+# A benchmark regressed if its time divided by the one of the baseline
+# exceeds factor * (1 + noise of both runs), the noise of a run being the
+# relative spread (max - min) / min of its repeats.
+
+SIZES = (100, 1000, 10000)
+LOADS = (0.05, 0.14)
+REPEAT = 5
+MIN_TIME = 0.1  # s of measured calls of run() per repeat
+MAX_CALLS = 1000  # calls of run() per repeat at most
+REGRESSION_FACTOR = 1.2  # slower than the baseline by this factor: regression
+
+
+def trained_network(N, p, rng):
+    hopfield_network = HopfieldNetwork(N=N, rng=rng)
+    hopfield_network.train_pattern(random_patterns(N, p, rng))
+    return hopfield_network
+
+
+def noisy_state(hopfield_network, rng, noise=0.1):  # saved pattern 0, flipped
+    return flip_exact(hopfield_network.xi[:, 0], int(noise * hopfield_network.N), rng)
+
+
+# benchmarks
+def bench_train_pattern(N, p, rng, directory):
+    hopfield_network = HopfieldNetwork(N=N, rng=rng)
+    xi = random_patterns(N, p, rng)
+
+    def run():
+        for k in range(p):
+            hopfield_network.train_pattern(xi[:, k])
+        return p
+
+    return run, "patterns"
+
+
+def bench_remove_pattern(N, p, rng, directory):
+    hopfield_network = trained_network(N, p, rng)
+
+    def run():
+        hopfield_network.remove_pattern(0)
+        return 1
+
+    return run, "patterns"
+
+
+def bench_update_neurons(mode, run_max):
+    def bench(N, p, rng, directory):
+        hopfield_network = trained_network(N, p, rng)
+        hopfield_network.set_initial_neurons_state(noisy_state(hopfield_network, rng))
+
+        def run():
+            t = hopfield_network.t
+            termination = hopfield_network.update_neurons(1, mode, run_max=run_max)
+            sweeps = 1
+            if run_max:  # t does not count the last sweep at a fixed point
+                sweeps = hopfield_network.t - t + (termination == "fixed_point")
+            return sweeps * N
+
+        return run, "neuron updates"
+
+    return bench
+
+
+def bench_finite_temp(mode):
+    def bench(N, p, rng, directory):
+        hopfield_network = trained_network(N, p, rng)
+        hopfield_network.set_initial_neurons_state(noisy_state(hopfield_network, rng))
+
+        def run():
+            hopfield_network.update_neurons_with_finite_temp(1, mode, beta=2.0)
+            return N
+
+        return run, "neuron updates"
+
+    return bench
+
+
+def bench_compute_energy(N, p, rng, directory):
+    hopfield_network = trained_network(N, p, rng)
+    S = noisy_state(hopfield_network, rng)
+
+    def run():
+        hopfield_network.compute_energy(S)
+        return 1
+
+    return run, "states"
+
+
+def bench_check_stability(N, p, rng, directory):
+    hopfield_network = trained_network(N, p, rng)
+    S = hopfield_network.xi[:, 0]
+
+    def run():
+        hopfield_network.check_stability(S)
+        return 1
+
+    return run, "states"
+
+
+def bench_images2xi(N, p, rng, directory, n_images=16):
+    N_sqrt = int(np.sqrt(N))
+    paths = []
+    for k in range(n_images):  # gray images twice the size of the patterns
+        path = os.path.join(directory, "{}.png".format(k))
+        pixels = rng.integers(256, size=(2 * N_sqrt, 2 * N_sqrt), dtype="uint8")
+        Image.fromarray(pixels).save(path)
+        paths.append(path)
+
+    def run():
+        images2xi(paths, N_sqrt**2)
+        return n_images
+
+    return run, "images"
+
+
+def bench_save_load(extension):
+    def bench(N, p, rng, directory):
+        hopfield_network = trained_network(N, p, rng)
+        path = os.path.join(directory, "network" + extension)
+
+        def run():
+            hopfield_network.save_network(path)
+            HopfieldNetwork(filepath=path)
+            return os.path.getsize(path)
+
+        return run, "bytes"
+
+    return bench
+
+
+BENCHMARKS = {
+    "train_pattern": bench_train_pattern,
+    "remove_pattern": bench_remove_pattern,
+    "update_neurons_sync": bench_update_neurons("sync", False),
+    "update_neurons_async": bench_update_neurons("async", False),
+    "update_neurons_sync_run_max": bench_update_neurons("sync", True),
+    "update_neurons_async_run_max": bench_update_neurons("async", True),
+    "finite_temp_sync": bench_finite_temp("sync"),
+    "finite_temp_async": bench_finite_temp("async"),
+    "compute_energy": bench_compute_energy,
+    "check_stability": bench_check_stability,
+    "images2xi": bench_images2xi,
+    "save_load_npz": bench_save_load(".npz"),
+    "save_load_hfn": bench_save_load(".hfn"),
+}
+
+
+def measure(bench, N, p, repeat=REPEAT, seed=0, min_time=MIN_TIME):
+    times = []  # mean time per call of every repeat
+    works = []  # work of every measured call, differs between the inputs
+    k = 0  # number of the prepared inputs, seeds their random stream
+    for _ in range(repeat):
+        elapsed = 0.0
+        calls = 0
+        while calls == 0 or (elapsed < min_time and calls < MAX_CALLS):
+            run, unit, directory = prepare(bench, N, p, stream(seed, k))
+            k += 1
+            try:
+                start = time.perf_counter()
+                work = run()
+                elapsed += time.perf_counter() - start
+                works.append(work)
+            finally:
+                shutil.rmtree(directory, ignore_errors=True)
+            calls += 1
+        times.append(elapsed / calls)
+    # extra run for the peak memory, tracemalloc slows it down
+    run, unit, directory = prepare(bench, N, p, stream(seed, k))
+    try:
+        tracemalloc.start()
+        try:
+            run()
+            peak_memory = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+    wall_time = min(times)
+    return {
+        "time": wall_time,
+        "times": times,
+        "peak_memory": peak_memory,
+        "throughput": (
+            float(np.mean(works)) / wall_time if wall_time > 0 else float("inf")
+        ),
+        "unit": unit,
+    }
+
+
+def prepare(bench, N, p, rng):  # fresh inputs in a new temporary directory
+    directory = tempfile.mkdtemp()
+    try:
+        run, unit = bench(N, p, rng, directory)
+    except BaseException:
+        shutil.rmtree(directory, ignore_errors=True)
+        raise
+    return run, unit, directory
+
+
+def run_benchmarks(
+    names=None, sizes=SIZES, loads=LOADS, repeat=REPEAT, min_time=MIN_TIME, verbose=True
+):
+    results = []
+    for name in names or sorted(BENCHMARKS):
+        for N in sizes:
+            for load in loads:
+                p = max(1, int(round(load * N)))
+                result = {"benchmark": name, "N": N, "p": p}
+                result.update(
+                    measure(BENCHMARKS[name], N, p, repeat, min_time=min_time)
+                )
+                results.append(result)
+                if verbose:
+                    print(format_result(result))
+    return {
+        "version": __version__,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "results": results,
+    }
+
+
+def format_result(result):
+    return "{:<30} N={:<6} p={:<6} {:>10.4f} s {:>10.1f} MB {:>12.4g} {}/s".format(
+        result["benchmark"],
+        result["N"],
+        result["p"],
+        result["time"],
+        result["peak_memory"] / 2**20,
+        result["throughput"],
+        result["unit"],
+    )
+
+
+def spread(result):  # relative spread of the repeats, the noise of a run
+    times = result.get("times", [result["time"]])
+    return (max(times) - min(times)) / max(min(times), 1e-12)
+
+
+def compare(new, old, factor=REGRESSION_FACTOR):
+    # prints the ratio of the wall times of both runs for every benchmark in
+    # both, returns the regressions: slower than old by more than the
+    # threshold factor * (1 + noise of both runs)
+    old_results = {
+        (result["benchmark"], result["N"], result["p"]): result
+        for result in old["results"]
+    }
+    regressions = []
+    print(
+        "{:<30} {:<8} {:<8} {:>10} {:>10}".format(
+            "benchmark", "N", "p", "new / old", "threshold"
+        )
+    )
+    for result in new["results"]:
+        key = (result["benchmark"], result["N"], result["p"])
+        if key not in old_results:
+            continue
+        ratio = result["time"] / max(old_results[key]["time"], 1e-12)
+        threshold = factor * (1 + spread(result) + spread(old_results[key]))
+        flag = ""
+        if ratio > threshold:
+            flag = "  regression"
+            regressions.append(result)
+        print(
+            "{:<30} {:<8} {:<8} {:>10.2f} {:>10.2f}{}".format(
+                *key + (ratio, threshold, flag)
+            )
+        )
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m hopfieldnetwork.benchmark",
+        description="Benchmarks of the Hopfield network operations.",
+    )
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES)
+    parser.add_argument("--loads", type=float, nargs="+", default=LOADS)
+    parser.add_argument("--repeat", type=int, default=REPEAT)
+    parser.add_argument(
+        "--min-time", type=float, default=MIN_TIME, help="s of calls per repeat"
+    )
+    parser.add_argument(
+        "--only", nargs="+", choices=sorted(BENCHMARKS), help="benchmarks to run"
+    )
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="JSON file of an earlier run")
+    parser.add_argument("--factor", type=float, default=REGRESSION_FACTOR)
+    args = parser.parse_args(argv)
+    results = run_benchmarks(
+        args.only, args.sizes, args.loads, args.repeat, args.min_time
+    )
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+    if args.compare:
+        with open(args.compare) as file:
+            old = json.load(file)
+        if compare(results, old, args.factor):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,55 @@
+from __future__ import division
+import numpy as np
+
+# Bit-packed neuron states: a state with N entries +-1 is stored as
+# ceil(N / 64) uint64 words, a set bit for +1. Hamming distances and overlaps
+# of packed states are popcounts of XORed words, 8x less memory traffic than
+# comparing int8 arrays.
+
+if hasattr(np, "bitwise_count"):  # NumPy >= 2.0
+
+    def popcount(words):  # number of set bits along the last axis
+        return np.bitwise_count(words).sum(axis=-1, dtype="int64")
+
+else:
+    POPCOUNT_TABLE = np.array([bin(i).count("1") for i in range(256)], dtype="uint8")
+
+    def popcount(words):  # number of set bits along the last axis
+        octets = words.view("uint8").reshape(words.shape[:-1] + (-1,))
+        return POPCOUNT_TABLE[octets].sum(axis=-1, dtype="int64")
+
+
+def pack_states(S):  # S: single state (N,) or states as rows (B, N)
+    S = np.asarray(S)
+    N = S.shape[-1]
+    n_words = -(-N // 64)
+    octets = np.zeros(S.shape[:-1] + (8 * n_words,), dtype="uint8")
+    octets[..., : -(-N // 8)] = np.packbits(S > 0, axis=-1)
+    return octets.view("uint64")
+
+
+def unpack_states(packed, N):  # inverse of pack_states, +-1 states as int8
+    octets = np.ascontiguousarray(packed).view("uint8")
+    bits = np.unpackbits(octets, axis=-1, count=N).view("int8")
+    return 2 * bits - 1
+
+
+def packed_hamming_distance(x, y):  # broadcasts over leading axes
+    return popcount(np.bitwise_xor(x, y))
+
+
+def packed_overlap(x, y, N):  # m = x . y / N of the unpacked states
+    return (N - 2 * packed_hamming_distance(x, y)) / N
+
+
+def nearest_pattern(packed_S, packed_xi, N, inverse=False):
+    # Nearest saved pattern (rows of packed_xi) for one packed state or a
+    # batch of packed states. With inverse=True the inverted patterns count
+    # as well, i.e. the distance is min(d, N - d). Returns the indices of the
+    # nearest patterns and their Hamming distances.
+    packed_S = np.asarray(packed_S)
+    d = packed_hamming_distance(packed_S[..., np.newaxis, :], packed_xi)
+    if inverse:
+        d = np.minimum(d, N - d)
+    index = np.argmin(d, axis=-1)
+    return index, np.take_along_axis(d, index[..., np.newaxis], axis=-1)[..., 0]
@@ -0,0 +1,82 @@
+from __future__ import division
+import hashlib
+from collections import OrderedDict
+from .bits import pack_states
+
+# Optional memoization of update_neurons(..., run_max=True). A network only
+# uses it if hopfield_network.recall_cache is set:
+#
+#   hopfield_network.recall_cache = RecallCache(max_bytes=2**26)
+#   hopfield_network.set_initial_neurons_state(probe)
+#   hopfield_network.update_neurons(0, "sync", run_max=True)  # miss: runs
+#   hopfield_network.set_initial_neurons_state(probe)
+#   hopfield_network.update_neurons(0, "sync", run_max=True)  # hit: replays
+#   hopfield_network.recall_cache.stats()
+#
+# Entries are keyed by a hash of the packed initial state and the arguments
+# of the update, and hold the packed final state, the time steps and the
+# termination. They belong to one version of the weights: every change of the
+# weights (training, removing, loading, ...) gives the network a new weights
+# version, the first lookup with it clears the cache. The least recently used
+# entries are evicted when the entries exceed max_bytes. Asynchronous updates
+# replay the result of the random neuron order of the first recall.
+
+ENTRY_OVERHEAD = 200  # approximate bytes of key, tuple and dict slot
+
+
+class RecallCache(object):
+    def __init__(self, max_bytes=2**26):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()  # key -> (packed S, dt, termination)
+        self.nbytes = 0
+        self.version = None  # weights version of the entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def key(self, S, mode, iterations, max_iterations):
+        digest = hashlib.blake2b(pack_states(S).tobytes(), digest_size=16).digest()
+        return digest, mode, iterations, max_iterations
+
+    def get(self, key, version):  # (packed S, dt, termination) or None
+        if version != self.version:  # the weights changed
+            if self.entries:
+                self.invalidations += 1
+            self.clear()
+            self.version = version
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def put(self, key, S, dt, termination):
+        packed = pack_states(S)
+        size = packed.nbytes + ENTRY_OVERHEAD
+        if size > self.max_bytes:
+            return
+        self.entries[key] = (packed, dt, termination)
+        self.nbytes += size
+        while self.nbytes > self.max_bytes:  # least recently used first
+            _, (packed, _, _) = self.entries.popitem(last=False)
+            self.nbytes -= packed.nbytes + ENTRY_OVERHEAD
+            self.evictions += 1
+
+    def clear(self):
+        self.entries.clear()
+        self.nbytes = 0
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "entries": len(self.entries),
+            "nbytes": self.nbytes,
+        }
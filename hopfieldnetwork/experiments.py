@@ -0,0 +1,158 @@
+from __future__ import division, print_function
+import itertools
+import json
+import os
+from multiprocessing import Pool
+import numpy as np
+from .generators import flip_exact, random_patterns, stream
+from .libary import HopfieldNetwork
+
+# Monte-Carlo sweeps over grids of network parameters. Every trial gets its
+# own random number stream derived from the seed, the index of the grid point
+# and the trial number, so the results do not depend on the number of worker
+# processes or on the order in which the trials finish.
+
+GRID_KEYS = ("N", "p", "mode", "beta", "noise")
+GRID_DEFAULTS = {"mode": "async", "beta": np.inf, "noise": 0.0}
+
+
+def grid_points(grid):  # cartesian product of the grid values as dicts
+    values = []
+    for key in GRID_KEYS:
+        value = grid.get(key, GRID_DEFAULTS.get(key))
+        if value is None:
+            raise ValueError("Missing grid parameter: {}".format(key))
+        values.append(np.atleast_1d(value).tolist())
+    return [dict(zip(GRID_KEYS, point)) for point in itertools.product(*values)]
+
+
+def run_trial(task):
+    metric, seed, i, j, params = task
+    rng = stream(seed, i, j)
+    return i, j, np.asarray(metric(params, rng), dtype="float64").tolist()
+
+
+def run_sweep(
+    metric, grid, n_trials=1, seed=0, processes=None, checkpoint=None, verbose=False
+):
+    # metric(params, rng) -> float or array of floats, must be picklable (a
+    # module level function or a functools.partial of one) when processes
+    # are used. Completed trials are written to the JSON file checkpoint, an
+    # interrupted sweep with the same grid, seed and metric continues there.
+    points = grid_points(grid)
+    results = {}  # "i" -> {"j": value of trial j at grid point i}
+    if checkpoint and os.path.exists(checkpoint):
+        with open(checkpoint) as file:
+            saved = json.load(file)
+        if saved["points"] != points or saved["seed"] != seed:
+            raise ValueError("Checkpoint {} is from another sweep.".format(checkpoint))
+        results = saved["results"]
+    tasks = [
+        (metric, seed, i, j, params)
+        for i, params in enumerate(points)
+        for j in range(n_trials)
+        if str(j) not in results.get(str(i), {})
+    ]
+    if processes == 1 or len(tasks) <= 1:
+        finished = map(run_trial, tasks)
+        pool = None
+    else:
+        pool = Pool(processes)
+        n_workers = processes or os.cpu_count() or 1
+        chunksize = max(1, len(tasks) // (8 * n_workers))
+        finished = pool.imap_unordered(run_trial, tasks, chunksize)
+    try:
+        for n, (i, j, value) in enumerate(finished):
+            results.setdefault(str(i), {})[str(j)] = value
+            if checkpoint and (n + 1) % 100 == 0:
+                save_checkpoint(checkpoint, points, seed, results)
+            if verbose:
+                print("\r{} / {} trials".format(n + 1, len(tasks)), end="")
+    finally:
+        if pool is not None:
+            pool.terminate()
+        if checkpoint and tasks:
+            save_checkpoint(checkpoint, points, seed, results)
+    return aggregate(points, results, n_trials)
+
+
+def save_checkpoint(path, points, seed, results):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as file:
+        json.dump({"points": points, "seed": seed, "results": results}, file)
+    os.replace(tmp_path, path)  # never leave a half written checkpoint
+
+
+def aggregate(points, results, n_trials):
+    # structured array, one row per grid point with mean and variance of the
+    # metric over its trials (fields of the same shape as the metric)
+    values = [
+        np.array([results[str(i)][str(j)] for j in range(n_trials)])
+        for i in range(len(points))
+    ]
+    shape = values[0].shape[1:] if values else ()
+    dtype = [
+        ("N", "int64"),
+        ("p", "int64"),
+        ("mode", "U5"),
+        ("beta", "float64"),
+        ("noise", "float64"),
+        ("mean", "float64", shape),
+        ("var", "float64", shape),
+        ("n_trials", "int64"),
+    ]
+    sweep = np.zeros(len(points), dtype=dtype)
+    for row, params, value in zip(sweep, points, values):
+        for key in GRID_KEYS:
+            row[key] = params[key]
+        row["mean"] = value.mean(axis=0)
+        row["var"] = value.var(axis=0, ddof=1) if n_trials > 1 else 0
+        row["n_trials"] = n_trials
+    return sweep
+
+
+# metrics
+def random_network(params, rng):
+    N, p = params["N"], params["p"]
+    hopfield_network = HopfieldNetwork(N=N, rng=rng)
+    hopfield_network.train_pattern(random_patterns(N, p, rng))
+    return hopfield_network
+
+
+def flip_fraction(S, noise, rng):  # flips exactly round(noise * N) neurons
+    return flip_exact(S, int(round(noise * S.shape[0])), rng)
+
+
+def run_dynamics(hopfield_network, params, iterations):
+    if np.isinf(params["beta"]):
+        hopfield_network.update_neurons(iterations, params["mode"], run_max=True)
+    else:
+        hopfield_network.update_neurons_with_finite_temp(
+            iterations, params["mode"], params["beta"]
+        )
+
+
+def error_rate(params, rng, iterations=20):
+    # fraction of wrong neurons after the dynamics started from every saved
+    # pattern with a fraction noise of flipped neurons
+    hopfield_network = random_network(params, rng)
+    wrong = 0
+    for k in range(hopfield_network.p):
+        xi_k = hopfield_network.xi[:, k]
+        hopfield_network.set_initial_neurons_state(
+            flip_fraction(xi_k, params["noise"], rng)
+        )
+        run_dynamics(hopfield_network, params, iterations)
+        wrong += np.sum(hopfield_network.S != xi_k)
+    return wrong / hopfield_network.p / hopfield_network.N
+
+
+def spurious_state(params, rng, iterations=20, threshold=0.05):
+    # 1 if the dynamics from a random initial state end further than
+    # threshold * N from every saved pattern and its inverse, else 0
+    hopfield_network = random_network(params, rng)
+    N = hopfield_network.N
+    hopfield_network.set_initial_neurons_state(random_patterns(N, rng=rng))
+    run_dynamics(hopfield_network, params, iterations)
+    _, d = hopfield_network.nearest_pattern(hopfield_network.S, inverse=True)
+    return float(d / N > threshold)
@@ -0,0 +1,93 @@
+from __future__ import division
+import numpy as np
+
+# Random patterns and corrupted probes as int8 arrays of +-1. Every function
+# takes rng, anything numpy.random.default_rng accepts: None for fresh
+# entropy, a seed, a SeedSequence or a Generator (used as it is). Parallel
+# workers get independent, reproducible streams from stream(seed, key).
+
+
+def stream(seed, *key):  # Generator of the stream key (ints) of a seed
+    return np.random.default_rng(np.random.SeedSequence(seed, spawn_key=key))
+
+
+def random_patterns(N, p=None, rng=None):
+    # uniformly random patterns as columns (N, p), or one pattern (N,) for
+    # p None, from one random bit per neuron
+    rng = np.random.default_rng(rng)
+    shape = (N,) if p is None else (N, p)
+    n = int(np.prod(shape))
+    octets = rng.integers(256, size=-(-n // 8), dtype="uint8")
+    bits = np.unpackbits(octets, count=n).view("int8").reshape(shape)
+    bits *= 2
+    bits -= 1
+    return bits
+
+
+def biased_patterns(N, p=None, bias=0.0, rng=None):
+    # patterns with mean activity bias, i.e. +1 with probability (1 + bias) / 2
+    rng = np.random.default_rng(rng)
+    shape = (N,) if p is None else (N, p)
+    positive = rng.random(shape, dtype="float32") < (1 + bias) / 2
+    return np.where(positive, 1, -1).astype("int8")
+
+
+def correlated_patterns(N, p, overlap, n_families=1, rng=None):
+    # p patterns in n_families families (pattern k belongs to family
+    # k % n_families). Every neuron equals the one of a random parent pattern
+    # of the family with probability (1 + overlap) / 2, so patterns have the
+    # mean overlap overlap with their parent and overlap^2 with each other.
+    # Returns the patterns (N, p) and the parents (N, n_families).
+    rng = np.random.default_rng(rng)
+    parents = random_patterns(N, n_families, rng)
+    xi = parents[:, np.arange(p) % n_families]
+    xi[rng.random((N, p), dtype="float32") >= (1 + overlap) / 2] *= -1
+    return xi, parents
+
+
+def random_positions(shape, k, rng):
+    # k different random positions along the last axis of shape for every row
+    N = shape[-1]
+    if k >= N:
+        return np.broadcast_to(np.arange(N), shape[:-1] + (N,))
+    if len(shape) == 1:
+        return rng.choice(N, k, replace=False)
+    return np.argpartition(rng.random(shape, dtype="float32"), k, axis=-1)[..., :k]
+
+
+def flip_exact(S, k, rng=None):
+    # copy of the state (N,) or states (B, N) with exactly k neurons flipped
+    # (sampled without replacement, a different set for every state)
+    rng = np.random.default_rng(rng)
+    S = np.array(S, dtype="int8")
+    index = random_positions(S.shape, k, rng)
+    if len(S.shape) == 1:
+        S[index] *= -1
+    else:
+        S[np.arange(S.shape[0])[:, np.newaxis], index] *= -1
+    return S
+
+
+def mask_exact(S, k, value=-1, rng=None):
+    # copy of the state (N,) or states (B, N) with exactly k neurons set to
+    # value, e.g. -1 for white pixels of an image
+    rng = np.random.default_rng(rng)
+    S = np.array(S, dtype="int8")
+    index = random_positions(S.shape, k, rng)
+    if len(S.shape) == 1:
+        S[index] = value
+    else:
+        S[np.arange(S.shape[0])[:, np.newaxis], index] = value
+    return S
+
+
+def noisy_probes(xi, n_probes, k, rng=None, corruption="flip", value=-1):
+    # n_probes corrupted copies of every pattern (column of xi) in one array
+    # of probes as rows (p * n_probes, N), grouped by pattern. corruption
+    # "flip" flips exactly k neurons, "mask" sets exactly k neurons to value.
+    probes = np.repeat(np.asarray(xi).reshape(xi.shape[0], -1).T, n_probes, axis=0)
+    if corruption == "flip":
+        return flip_exact(probes, k, rng)
+    elif corruption == "mask":
+        return mask_exact(probes, k, value, rng)
+    raise ValueError("Unknown corruption: {}".format(corruption))
@@ -1,5 +1,7 @@
 from __future__ import division, print_function
 import sys, os
+import threading
+import time
 
 try:  # Python2
     import Tkinter as tk
@@ -26,14 +28,18 @@ plt.rc("ytick", labelsize=SIZE_1)  # fontsize of the tick labels
 plt.rc("axes", labelsize=SIZE_2)  # fontsize of the x and y labels
 plt.rc("legend", fontsize=SIZE_3)  # legend fontsize
 
+from .generators import flip_exact, random_patterns
+from .instrumentation import Instrumentation
 from .libary import HopfieldNetwork
 from .utils import AttrDict, images2xi
-from .tk_utils import CreateToolTip, checkOS, ScrollSpinbox
+from .tk_utils import BlitImage, CreateToolTip, checkOS, ScrollSpinbox
 
 BASE_PATH = os.path.abspath(os.path.dirname(__file__))
 DATA_PATH = os.path.join(BASE_PATH, "data")
 EXAMPLES_PATH = os.path.join(DATA_PATH, "hopfield_network_examples")
 PHYSICISTS_PATH = os.path.join(DATA_PATH, "famous_physicists")
+FRAME_INTERVAL = 40  # ms between two frames of running dynamics (25 fps)
+REDRAW_INTERVAL = 16  # ms, a panel coalesces all redraws of one display frame
 
 # print system informations
 print("Python:     {}.{}.{}".format(*sys.version_info[:3]))
@@ -41,6 +47,10 @@ print("Matplotlib: {}".format(mpl.__version__))
 print("OS:         {}\n".format(checkOS()))
 
 
+class UpdateCancelled(Exception):  # raised in the worker to stop the dynamics
+    pass
+
+
 # main application
 class GUI:
     def __init__(self):
@@ -70,6 +80,14 @@ class GUI:
         self.time_label_text = "t = {}"
         self.highlightthickness = 1
         self.n_neurons_vec = (4, 9, 25, 36, 100, 400, 900, 1600, 2500, 3600, 10000)
+        self.sweep_label_text = "sweep {}"
+
+        # the dynamics run in a background worker thread
+        self.worker = None
+        self.worker_frame = None  # latest (S, sweep, energy) of the worker
+        self.worker_cancel = threading.Event()
+        self.worker_resume = threading.Event()  # cleared while paused
+        self.worker_resume.set()
 
         # initialize Hopfield network
         self.hopfield_network = HopfieldNetwork(N=self.settings.default_N)
@@ -337,6 +355,9 @@ class GUI:
             interpolation="none",
         )
         self.set_axes_layout(self.input_fig, self.input_ax)
+        self.input_image = BlitImage(
+            self.input_canvas, self.im_input_frame, REDRAW_INTERVAL
+        )
         self.input_canvas.draw()
         # label stability input pattern
         self.label_stability_input_pattern = tk.Label(
@@ -388,8 +409,7 @@ class GUI:
         self.button_clear.pack(side="left")
 
     def update_input_frame(self):
-        self.im_input_frame.set_data(self.input_matrix)
-        self.input_canvas.draw()
+        self.input_image.set_data(self.input_matrix)
         self.label_energy_input_pattern.configure(
             text=self.energy_label_text.format(
                 self.hopfield_network.compute_energy(self.input_matrix.flatten())
@@ -400,7 +420,7 @@ class GUI:
         )
 
     def change_input_pattern(self, event):
-        if event.inaxes is None:
+        if event.inaxes is None or event.button not in (1, 3):  # no drawing
             return
         elif event.button == 1:
             self.input_matrix[
@@ -410,23 +430,24 @@ class GUI:
             self.input_matrix[
                 int(round(event.ydata)), int(round(event.xdata))
             ] = -1  # x und y vertauscht wegen imshow
-        self.im_input_frame.set_data(self.input_matrix)
-        self.input_canvas.draw()
+        self.input_image.set_data(self.input_matrix)
 
     def set_input_pattern_as_initial_state(self):
+        self.cancel_update()
         self.hopfield_network.set_initial_neurons_state(
             np.copy(self.input_matrix.flatten())
         )
         self.update_output_frame()
 
     def train_input_pattern_to_hopfield_network(self):
+        self.cancel_update()
         self.hopfield_network.train_pattern(self.input_matrix.flatten())
         self.update_viewer_frame()
         self.update_output_frame()
         self.update_input_frame()
 
     def set_random_input_pattern(self):
-        self.input_matrix = 2 * np.random.randint(2, size=self.matrix_size) - 1
+        self.input_matrix = random_patterns(self.N_sqrt**2).reshape(self.matrix_size)
         self.update_input_frame()
 
     def clear_input_pattern(self):
@@ -465,6 +486,9 @@ class GUI:
             interpolation="none",
         )
         self.set_axes_layout(self.output_fig, self.output_ax)
+        self.output_image = BlitImage(
+            self.output_canvas, self.im_output_frame, REDRAW_INTERVAL
+        )
         self.output_canvas.draw()
         # label stability output pattern
         self.label_stability_output_pattern = tk.Label(
@@ -479,7 +503,7 @@ class GUI:
             self.master, text="Output pattern", font=self.label_font
         )
         self.output_controls_frame.grid(row=1, column=1)
-        self.grid_configure(self.output_controls_frame, 3, 3)
+        self.grid_configure(self.output_controls_frame, 4, 3)
         self.button_sync_update = tk.Button(
             self.output_controls_frame,
             text="1 sync update",
@@ -577,6 +601,26 @@ class GUI:
             self.button_set_random_initial, "Set random pattern as intial neuron state."
         )
         self.button_set_random_initial.grid(row=2, column=2, sticky="wens")
+        self.button_pause_update = tk.Button(
+            self.output_controls_frame,
+            text="Pause",
+            font=self.button_font,
+            state="disabled",
+            command=self.toggle_pause_update,
+        )
+        CreateToolTip(self.button_pause_update, "Pause / resume the running update.")
+        self.button_pause_update.grid(row=3, column=0, sticky="wens")
+        self.button_cancel_update = tk.Button(
+            self.output_controls_frame,
+            text="Cancel",
+            font=self.button_font,
+            state="disabled",
+            command=self.stop_update,
+        )
+        CreateToolTip(
+            self.button_cancel_update, "Cancel the running update after this sweep."
+        )
+        self.button_cancel_update.grid(row=3, column=1, sticky="wens")
         # finite temperatures
         self.label_finite_temperature = tk.Label(
             self.output_controls_frame,
@@ -595,11 +639,10 @@ class GUI:
         self.scrollspinbox_finite_temperature.grid_remove()
 
     def update_output_frame(self):
-        self.im_output_frame.set_data(self.hopfield_network.S.reshape(self.matrix_size))
-        self.output_canvas.draw()
+        self.output_image.set_data(self.hopfield_network.S.reshape(self.matrix_size))
         self.label_output_pattern.configure(
             text=", ".join((self.energy_label_text, self.time_label_text)).format(
-                self.hopfield_network.compute_energy(self.hopfield_network.S),
+                self.hopfield_network.energy,
                 self.hopfield_network.t,
             )
         )
@@ -608,31 +651,131 @@ class GUI:
         )
 
     def run_update(self, iterations, mode, run_max=False):
-        if not self.settings.finite_temperature.get():
-            self.hopfield_network.update_neurons(
-                iterations=iterations, mode=mode, run_max=run_max
+        # The dynamics run in a background thread which leaves the window
+        # responsive, every FRAME_INTERVAL ms the output frame shows its latest
+        # state. The network must not be changed before the worker stopped.
+        self.cancel_update()
+        self.worker_cancel.clear()
+        self.worker_resume.set()
+        self.worker_frame = None
+        self.worker = threading.Thread(
+            target=self.run_worker,
+            args=(
+                self.hopfield_network,
+                iterations,
+                mode,
+                run_max,
+                self.settings.finite_temperature.get(),
+                self.settings.beta.get(),
+            ),
+        )
+        self.worker.daemon = True  # does not keep a closed window alive
+        self.set_worker_controls(running=True)
+        self.worker.start()
+        self.master.after(FRAME_INTERVAL, self.poll_worker, self.worker)
+
+    def run_worker(
+        self, hopfield_network, iterations, mode, run_max, finite_temperature, beta
+    ):
+        last_frame = [0.0]
+
+        def sweep_hook(record):  # called by the network after every sweep
+            self.worker_resume.wait()
+            if self.worker_cancel.is_set():
+                raise UpdateCancelled()
+            now = time.time()
+            if now - last_frame[0] >= FRAME_INTERVAL / 1000:  # at most one copy
+                last_frame[0] = now  # per frame
+                S = np.copy(hopfield_network.S)
+                energy = record["energy"]
+                if np.isnan(energy):  # sync: one matrix product per frame
+                    energy = hopfield_network.compute_energy(S)
+                self.worker_frame = (S, record["sweep"], energy)
+
+        instrumentation = hopfield_network.instrumentation
+        # the energy of asynchronous sweeps follows from the local fields,
+        # synchronous ones would need a matrix product every sweep
+        hopfield_network.instrumentation = Instrumentation(
+            record_energy=mode == "async", hooks=[sweep_hook]
+        )
+        try:
+            if not finite_temperature:
+                hopfield_network.update_neurons(
+                    iterations=iterations, mode=mode, run_max=run_max
+                )
+            else:
+                hopfield_network.update_neurons_with_finite_temp(
+                    iterations=iterations, mode=mode, beta=beta
+                )
+        except UpdateCancelled:  # S of the last sweep is valid, not the caches
+            hopfield_network.S = np.copy(hopfield_network.S)
+            hopfield_network.state_changed()
+        finally:
+            hopfield_network.instrumentation = instrumentation
+
+    def poll_worker(self, worker):
+        if worker is not self.worker:  # cancelled, already shown
+            return
+        frame, self.worker_frame = self.worker_frame, None
+        if not worker.is_alive():
+            self.worker = None
+            self.set_worker_controls(running=False)
+            self.update_output_frame()
+            return
+        if frame is not None:
+            S, sweep, energy = frame
+            self.output_image.set_data(S.reshape(self.matrix_size))
+            self.label_output_pattern.configure(
+                text=self.energy_label_text.format(energy)
             )
-        else:
-            self.hopfield_network.update_neurons_with_finite_temp(
-                iterations=iterations, mode=mode, beta=self.settings.beta.get()
+            self.label_stability_output_pattern.configure(
+                text=self.sweep_label_text.format(sweep), fg="black"
             )
-        self.update_output_frame()
+        self.master.after(FRAME_INTERVAL, self.poll_worker, worker)
+
+    def cancel_update(self):  # stops running dynamics after the current sweep
+        if self.worker is not None:
+            self.worker_cancel.set()
+            self.worker_resume.set()
+            self.worker.join()
+            self.worker = None
+            self.set_worker_controls(running=False)
+
+    def stop_update(self):
+        if self.worker is not None:
+            self.cancel_update()
+            self.update_output_frame()
+
+    def toggle_pause_update(self):
+        if self.worker_resume.is_set():
+            self.worker_resume.clear()
+            self.button_pause_update.configure(text="Resume")
+        else:
+            self.worker_resume.set()
+            self.button_pause_update.configure(text="Pause")
+
+    def set_worker_controls(self, running):
+        state = "normal" if running else "disabled"
+        self.button_pause_update.configure(text="Pause", state=state)
+        self.button_cancel_update.configure(state=state)
 
     def set_partial_initial_state(self):
+        self.cancel_update()
         self.hopfield_network.S[: int(self.hopfield_network.N / 2)] = -1
         self.hopfield_network.set_initial_neurons_state(self.hopfield_network.S)
         self.update_output_frame()
 
     def set_randomize_state(self):
-        self.hopfield_network.S[
-            np.random.choice(self.hopfield_network.N, int(self.hopfield_network.N / 10))
-        ] *= -1
-        self.hopfield_network.set_initial_neurons_state(self.hopfield_network.S)
+        self.cancel_update()
+        self.hopfield_network.set_initial_neurons_state(
+            flip_exact(self.hopfield_network.S, int(self.hopfield_network.N / 10))
+        )
         self.update_output_frame()
 
     def set_random_initial_state(self):
+        self.cancel_update()
         self.hopfield_network.set_initial_neurons_state(
-            2 * np.random.randint(2, size=self.hopfield_network.N) - 1
+            random_patterns(self.hopfield_network.N)
         )
         self.update_output_frame()
 
@@ -677,6 +820,9 @@ class GUI:
             interpolation="none",
         )
         self.set_axes_layout(self.viewer_fig, self.viewer_ax)
+        self.viewer_image = BlitImage(
+            self.viewer_canvas, self.im_viewer_frame, REDRAW_INTERVAL
+        )
         self.viewer_canvas.draw()
         # label stability viewer pattern
         self.label_stability_viewer_pattern = tk.Label(
@@ -754,6 +900,7 @@ class GUI:
         self.button_remove_current_viewer_pattern.pack(side="left")
 
     def update_viewer_frame(self):
+        anno_text = self.viewer_anno.get_text()
         if self.hopfield_network.p != 0:
             self.label_id_current_saved_pattern.configure(
                 text=" {} / {} ".format(
@@ -787,7 +934,8 @@ class GUI:
             self.label_energy_viewer_pattern.configure(
                 text=self.energy_label_text.format(0)
             )
-        self.viewer_canvas.draw()
+        # the annotation is no part of the blitted image
+        self.viewer_image.request(full=self.viewer_anno.get_text() != anno_text)
 
     def change_viewer_pattern(self, id_new_pattern):
         if self.hopfield_network.p == 0:
@@ -803,6 +951,7 @@ class GUI:
         self.update_viewer_frame()
 
     def set_viewer_pattern_as_initial_state(self):
+        self.cancel_update()
         if self.hopfield_network.p != 0:
             self.hopfield_network.set_initial_neurons_state(
                 np.copy(self.hopfield_network.xi[:, self.id_current_viewer_pattern])
@@ -819,6 +968,7 @@ class GUI:
             self.update_input_frame()
 
     def remove_saved_pattern(self, i):
+        self.cancel_update()
         self.hopfield_network.remove_pattern(i)
         if (
             self.id_current_viewer_pattern == self.hopfield_network.p
@@ -830,16 +980,22 @@ class GUI:
 
     # Network functions
     def initialize_new_network(self, N):
+        self.cancel_update()
         self.hopfield_network = HopfieldNetwork(N=N)
         self.initialize_hopfield_network_variables()
         self.update_all_frames()
 
     def load_hopfield_network(self, path=None):
+        self.cancel_update()
         print("load hopfield network from file")
         if not path:
             path = tkFileDialog.askopenfilename(
                 initialdir=EXAMPLES_PATH,
-                filetypes=(("Numpy zipped archive", ("*.npz")), ("All Files", "*.*")),
+                filetypes=(
+                    ("Numpy zipped archive", ("*.npz")),
+                    ("Hopfield network file", ("*.hfn")),
+                    ("All Files", "*.*"),
+                ),
                 title="Choose a Hopfield etwork file.",
             )
         if not path:
@@ -850,10 +1006,15 @@ class GUI:
             self.update_all_frames()
 
     def save_hopfield_network(self):
+        self.cancel_update()
         path = tkFileDialog.asksaveasfilename(
             initialdir=EXAMPLES_PATH,
-            filetypes=(("Numpy zipped archive", ("*.npz")), ("All Files", "*.*")),
-            title="Save hopfiled network as Numpy zipped archive (NPZ).",
+            filetypes=(
+                ("Numpy zipped archive", ("*.npz")),
+                ("Hopfield network file", ("*.hfn")),
+                ("All Files", "*.*"),
+            ),
+            title="Save hopfiled network as NPZ archive or network file (HFN).",
         )
         if not path:
             print("Cancel")
@@ -861,6 +1022,7 @@ class GUI:
             self.hopfield_network.save_network(path)
 
     def add_images_to_network(self, input_path_vec=None):
+        self.cancel_update()
         print("add image to hopfield network")
         if not input_path_vec:
             input_path_vec = tkFileDialog.askopenfilenames(
@@ -879,6 +1041,7 @@ class GUI:
             self.update_all_frames()
 
     def build_network_from_images(self, input_path_vec=None, N=10000):
+        self.cancel_update()
         print("build hopfield network from images")
         if not input_path_vec:
             input_path_vec = tkFileDialog.askopenfilenames(
@@ -899,8 +1062,9 @@ class GUI:
             self.update_all_frames()
 
     def build_network_from_random_patterns(self, N, p):
+        self.cancel_update()
         self.hopfield_network = HopfieldNetwork(N=N)
-        self.hopfield_network.train_pattern(2 * np.random.randint(2, size=(N, p)) - 1)
+        self.hopfield_network.train_pattern(random_patterns(N, p))
         self.initialize_hopfield_network_variables()
         self.update_all_frames()
 
@@ -918,6 +1082,7 @@ class GUI:
         self.update_input_frame()
         self.update_output_frame()
         self.update_viewer_frame()
+        self.draw_all()  # the extents changed
 
     def update_stability_label(self, pattern, label):
         if self.hopfield_network.check_stability(pattern):
@@ -955,9 +1120,9 @@ class GUI:
             fig.tight_layout()
 
     def draw_all(self):
-        self.input_canvas.draw()
-        self.output_canvas.draw()
-        self.viewer_canvas.draw()
+        self.input_image.request(full=True)
+        self.output_image.request(full=True)
+        self.viewer_image.request(full=True)
 
     def toggle_ticks(self):
         print("Show axes {}".format(self.settings.show_ticks.get()))
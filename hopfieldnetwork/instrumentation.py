@@ -0,0 +1,115 @@
+from __future__ import division
+import json
+import numpy as np
+
+# Optional instrumentation of the update engines. A network only calls into
+# it if hopfield_network.instrumentation is set, disabled it costs one
+# attribute check per sweep:
+#
+#   instrumentation = Instrumentation(record_energy=True, hooks=[print])
+#   hopfield_network.instrumentation = instrumentation
+#   hopfield_network.update_neurons(5, "async", run_max=True)
+#   instrumentation.records()  # one row per sweep
+#
+# Hooks are called with a SWEEP_FIELDS dict after every sweep, or with
+# every=n after sweeps which complete another n neuron updates. The sink, a
+# callable like JSONLinesSink, gets a summary dict at the end of every call.
+
+SWEEP_FIELDS = [
+    ("call", "int64"),  # number of the update call
+    ("sweep", "int64"),  # number of the sweep within the call
+    ("mode", "U5"),
+    ("flips", "int64"),  # neurons which changed their state
+    ("time", "float64"),  # wall time of the sweep
+    ("energy", "float64"),  # energy after the sweep, nan if not recorded
+]
+
+
+class Instrumentation(object):
+    def __init__(self, record_energy=False, hooks=(), every=None, sink=None):
+        self.record_energy = record_energy
+        self.hooks = list(hooks)
+        self.every = every  # neuron updates between hook calls, None: sweeps
+        self.sink = sink
+        self.calls = 0
+        self.sweeps = 0
+        self.flips = 0
+        self.matvecs = 0  # full local field computations w S
+        self.time = 0.0
+        self.neuron_updates = 0
+        self.sweep_records = []
+        self.call_sweeps = 0
+        self.call_start = 0  # index of the first sweep record of the call
+        self.mode = None
+
+    def begin(self, mode):
+        self.calls += 1
+        self.call_sweeps = 0
+        self.call_start = len(self.sweep_records)
+        self.mode = mode
+
+    def matvec(self, n=1):
+        self.matvecs += n
+
+    def sweep(self, hopfield_network, flips, elapsed, h=None):
+        # h: unscaled local fields of the new state if at hand, else the
+        # energy costs another matrix-vector product
+        energy = np.nan
+        if self.record_energy:
+            S = hopfield_network.S
+            if h is None:
+                energy = hopfield_network.compute_energy(S)
+                self.matvecs += 1
+            else:
+                energy = -0.5 * hopfield_network.weights.scale * np.dot(S, h)
+        self.sweeps += 1
+        self.call_sweeps += 1
+        self.flips += flips
+        self.time += elapsed
+        last_updates = self.neuron_updates
+        self.neuron_updates += hopfield_network.N
+        record = (self.calls, self.call_sweeps, self.mode, flips, elapsed, energy)
+        self.sweep_records.append(record)
+        if self.hooks and (
+            self.every is None
+            or self.neuron_updates // self.every > last_updates // self.every
+        ):
+            record = dict(zip([name for name, _ in SWEEP_FIELDS], record))
+            for hook in self.hooks:
+                hook(record)
+
+    def end(self, termination=None):
+        if self.sink is not None:
+            summary = self.summary()
+            summary["termination"] = termination
+            self.sink(summary)
+
+    def summary(self):  # counters of the last call and of all calls
+        last = self.sweep_records[self.call_start :]
+        return {
+            "call": self.calls,
+            "mode": self.mode,
+            "sweeps": len(last),
+            "flips": [int(record[3]) for record in last],
+            "time": float(sum(record[4] for record in last)),
+            "energy": [float(record[5]) for record in last],
+            "total_sweeps": self.sweeps,
+            "total_flips": int(self.flips),
+            "total_matvecs": self.matvecs,
+            "total_time": float(self.time),
+        }
+
+    def records(self):  # sweeps as structured array with SWEEP_FIELDS
+        return np.array(self.sweep_records, dtype=SWEEP_FIELDS)
+
+    def reset(self):
+        self.__init__(self.record_energy, self.hooks, self.every, self.sink)
+
+
+class JSONLinesSink(object):  # appends every summary as a line of JSON
+    def __init__(self, path):
+        self.path = path
+
+    def __call__(self, summary):
+        with open(self.path, "a") as file:
+            file.write(json.dumps(summary) + "\n")
@@ -1,9 +1,68 @@
 from __future__ import print_function, division
+from collections import namedtuple
+import itertools
+import os
+import time
 import numpy as np
+from .weights import DenseWeights, LowRankWeights, SparseWeights, LEARNING_RULES
+from .weights import random_connectivity, lattice_connectivity
+from .bits import pack_states, unpack_states, nearest_pattern
+from .networkfile import EXTENSION, is_network_file
+from .networkfile import load_network_file, save_network_file
+
+# use low-rank weights up to this load p / N, back again below half of it
+LOWRANK_MAX_LOAD = 0.1
+# versions of the weights, unique across networks
+WEIGHTS_VERSIONS = itertools.count()
+
+# result of a batched recall: final states, iterations per probe and flags
+RecallResult = namedtuple("RecallResult", ["S", "t", "fixed_point", "oscillating"])
+# result of finite temperature replicas: states (K, R, N) and energies (K, R)
+ReplicaResult = namedtuple("ReplicaResult", ["S", "E"])
 
 
 class HopfieldNetwork:
-    def __init__(self, N=100, filepath=None):
+    def __init__(
+        self,
+        N=100,
+        filepath=None,
+        storage=None,
+        dtype="float64",
+        rng=None,
+        max_load=None,
+        eviction="oldest",
+        connectivity=None,
+        rule="hebb",
+    ):
+        if storage not in (None, "auto", "dense", "lowrank", "sparse"):
+            raise ValueError("Unknown weight storage: {}".format(storage))
+        if storage == "sparse" and connectivity is None:
+            raise ValueError("Sparse weight storage needs a connectivity.")
+        if rule not in LEARNING_RULES:
+            raise ValueError("Unknown learning rule: {}".format(rule))
+        if rule != "hebb":  # other rules need dense float64 weights
+            if storage not in (None, "auto", "dense") or np.dtype(dtype) != "float64":
+                raise ValueError(
+                    "Learning rule {} needs dense float64 weights".format(rule)
+                )
+            storage = "dense"
+        if eviction not in ("oldest", "least_used"):
+            raise ValueError("Unknown eviction policy: {}".format(eviction))
+        # weight storage: dense, lowrank, sparse or auto, None: dense for new
+        # networks and the storage of the file for loaded ones
+        self.storage = storage
+        # CSR arrays (indptr, indices) of the connections of sparse weights,
+        # e.g. from random_connectivity or lattice_connectivity
+        self.connectivity = connectivity
+        self.rule = rule  # learning rule: hebb, storkey or pseudoinverse
+        self.instrumentation = None  # Instrumentation of the updates, optional
+        self.recall_cache = None  # RecallCache of update_neurons with run_max
+        self.dtype = np.dtype(dtype).name  # dtype of dense weights
+        # forgetful memory: training beyond p / N = max_load evicts patterns
+        self.max_load = max_load
+        self.eviction = eviction  # evict the oldest or the least used patterns
+        # random numbers for the dynamics, numpy.random.Generator or legacy
+        self.rng = np.random if rng is None else rng
         if not filepath:  # create new hopfield network with N neurons
             self.initialize_new_network(N)
         else:  # load hopfield network from file
@@ -11,37 +70,263 @@ class HopfieldNetwork:
 
     def initialize_new_network(self, N):
         self.N = N  # number of neurons
-        self.w = np.zeros((N, N))  # weight matrix
+        if self.storage is None:
+            self.storage = "dense"
+        if self.storage == "dense":  # weight matrix
+            self.weights = LEARNING_RULES[self.rule].zeros(N, self.dtype)
+        elif self.storage == "sparse":
+            if self.connectivity[0].shape[0] != N + 1:
+                raise ValueError("Connectivity does not match N = {}".format(N))
+            self.weights = SparseWeights.zeros(self.connectivity, self.dtype)
+        else:
+            self.weights = LowRankWeights(N)  # weights from saved patterns
         self.xi = np.empty((N, 0), dtype="int8")  # array with saved patterns
         self.S = -1 * np.ones(N, dtype="int8")  # state of the neurons
         self.p = 0  # number of saved patterns
         self.t = 0  # time steps
+        self.packed_xi_cache = None
+        self.weights_changed()
 
-    def load_network(self, filepath):
-        npzfile = np.load(filepath)
-        self.w = npzfile["arr_0"]
-        self.xi = npzfile["arr_1"]
-        self.N = self.w.shape[0]
-        self.S = -1 * np.ones(self.N, dtype="int8")
+    def load_network(self, filepath, mmap_mode="c"):
+        if is_network_file(filepath):  # memory-mapped, copy-on-write by default
+            arrays, attrs = load_network_file(filepath, mmap_mode)
+            w = arrays.get("w", np.empty((0, 0), dtype=attrs["dtype"]))
+            self.xi = arrays["xi"]
+            if attrs["storage"] == "sparse":
+                self.connectivity = arrays["indptr"], arrays["indices"]
+            self.rule = attrs.get("rule", "hebb")
+        else:  # numpy zipped archive
+            npzfile = np.load(filepath)
+            w = npzfile["arr_0"]
+            self.xi = npzfile["arr_1"]
+            if "arr_2" in npzfile:  # sparse weights with their connectivity
+                self.connectivity = npzfile["arr_2"], npzfile["arr_3"]
+        self.N = self.xi.shape[0]
         self.p = self.xi.shape[1]
+        self.dtype = w.dtype.name
+        if w.ndim == 1:  # counts of sparse weights
+            self.storage = "sparse"
+            self.weights = SparseWeights(*self.connectivity, data=w, n_patterns=self.p)
+        elif w.size == 0:  # saved with low-rank weights
+            self.weights = LowRankWeights(self.N)
+        elif self.dtype == "float64":
+            self.weights = DenseWeights(w)
+        else:  # Hebbian counts
+            self.weights = DenseWeights(w, scale=1.0 / self.N, n_patterns=self.p)
+        if self.storage is None:  # keep the storage of the file
+            self.storage = self.weights.storage
+        self.S = -1 * np.ones(self.N, dtype="int8")
         self.t = 0
+        self.packed_xi_cache = None
+        self.weights_changed()
+        if self.rule != "hebb":  # state of the rule is not saved, train again
+            self.storage = "dense"
+            self.build_dense_weights()
+        self.select_storage()
 
     def save_network(self, filepath):
-        np.savez(filepath, self.w, self.xi)
+        if os.fspath(filepath).endswith(EXTENSION):  # network file, memory-mappable
+            arrays = {"xi": self.xi}
+            if self.weights.storage == "dense":
+                arrays["w"] = self.weights.w
+            elif self.weights.storage == "sparse":
+                arrays["w"] = self.weights.data
+                arrays["indptr"] = self.weights.indptr
+                arrays["indices"] = self.weights.indices
+            attrs = {
+                "N": self.N,
+                "p": self.p,
+                "storage": self.weights.storage,
+                "dtype": self.dtype,
+                "rule": self.rule,
+            }
+            save_network_file(filepath, arrays, attrs)
+        elif self.weights.storage == "lowrank":  # weights follow from xi
+            np.savez(filepath, np.empty((0, 0), dtype=self.dtype), self.xi)
+        elif self.weights.storage == "sparse":
+            weights = self.weights
+            np.savez(filepath, weights.data, self.xi, weights.indptr, weights.indices)
+        else:
+            np.savez(filepath, self.weights.w, self.xi)
+
+    @property
+    def w(self):
+        # weight matrix, materialized for low-rank, sparse and integer weights.
+        # It is read-only, changes of the weights go through the setter
+        # (hopfield_network.w = w), which invalidates the cached fields.
+        w = self.weights.to_array(self.xi).view()
+        w.setflags(write=False)
+        return w
+
+    @w.setter
+    def w(self, w):  # an explicit weight matrix is always stored dense
+        self.storage = "dense"
+        self.dtype = "float64"
+        self.rule = "hebb"
+        self.weights = DenseWeights(np.asarray(w, dtype="float64"))
+        self.weights_changed()
+
+    def select_storage(self):  # switch between dense and low-rank weights
+        if self.storage == "dense" and self.weights.storage != "dense":
+            self.build_dense_weights()
+        elif self.storage == "lowrank" and self.weights.storage != "lowrank":
+            self.weights = LowRankWeights(self.N)
+        elif self.storage == "auto":
+            load = self.p / self.N
+            if self.weights.storage == "lowrank" and load > LOWRANK_MAX_LOAD:
+                self.build_dense_weights()
+            elif self.weights.storage == "dense" and load < LOWRANK_MAX_LOAD / 2:
+                self.weights = LowRankWeights(self.N)
+
+    def build_dense_weights(self):
+        weights = LEARNING_RULES[self.rule].zeros(self.N, self.dtype)
+        weights.add_patterns(self.xi)
+        self.weights = weights
+
+    @property
+    def xi(self):  # saved patterns as columns, view of the pattern buffer
+        return self.xi_buffer[:, : self.p]
+
+    @xi.setter
+    def xi(self, xi):
+        self.xi_buffer = xi
+        self.usage_buffer = np.zeros(xi.shape[1], dtype="int64")
+        self.p = xi.shape[1]
+
+    @property
+    def usage(self):  # number of recalls which ended in each saved pattern
+        return self.usage_buffer[: self.p]
+
+    def append_patterns(self, xi_new):  # amortized O(1) copies per pattern
+        xi_new = xi_new.reshape(self.N, -1)
+        p_new = self.p + xi_new.shape[1]
+        if p_new > self.xi_buffer.shape[1]:  # double the capacity
+            capacity = max(2 * self.xi_buffer.shape[1], p_new)
+            xi_buffer = np.empty((self.N, capacity), dtype=self.xi_buffer.dtype)
+            xi_buffer[:, : self.p] = self.xi
+            self.xi_buffer = xi_buffer
+            usage_buffer = np.zeros(capacity, dtype="int64")
+            usage_buffer[: self.p] = self.usage
+            self.usage_buffer = usage_buffer
+        self.xi_buffer[:, self.p : p_new] = xi_new
+        self.usage_buffer[self.p : p_new] = 0
+        self.p = p_new
+        self.packed_xi_cache = None
+
+    def compact_patterns(self, remove):
+        # drops the patterns with the sorted indices remove, in place in the
+        # buffers, only the patterns behind the first removed one are moved
+        keep = np.ones(self.p, dtype="bool")
+        keep[remove] = False
+        first, p_new = remove[0], self.p - remove.size
+        self.xi_buffer[:, first:p_new] = self.xi[:, first:][:, keep[first:]]
+        self.usage_buffer[first:p_new] = self.usage[first:][keep[first:]]
+        if self.packed_xi_cache is not None:
+            self.packed_xi_cache = self.packed_xi_cache[keep]
+        self.p = p_new
+
+    def pattern_indices(self, indices):  # indices or boolean mask -> indices
+        indices = np.asarray(indices)
+        if indices.dtype == "bool":
+            if indices.shape != (self.p,):
+                raise ValueError(
+                    "Unexpected shape of pattern mask: {}".format(indices.shape)
+                )
+            return np.flatnonzero(indices)
+        indices = indices.reshape(-1).astype("int64")
+        if np.any((indices >= self.p) | (indices < -self.p)):
+            raise ValueError("Pattern index out of range: {}".format(indices))
+        return np.where(indices < 0, indices + self.p, indices)
+
+    def select_evictions(self, k):
+        # indices of the patterns to forget before k new patterns are trained
+        if self.max_load is None:
+            return np.empty(0, dtype="int64")
+        n = min(self.p, self.p + k - int(self.max_load * self.N))
+        if n <= 0:
+            return np.empty(0, dtype="int64")
+        if self.eviction == "oldest":  # patterns are kept in training order
+            return np.arange(n)
+        return np.sort(np.argsort(self.usage, kind="stable")[:n])
 
     def train_pattern(self, input_pattern):
-        self.w += construct_hebb_matrix(input_pattern)
-        self.xi = np.column_stack((self.xi, input_pattern))
-        self.p = self.xi.shape[1]
+        if input_pattern.shape[0] != self.N:
+            raise ValueError(
+                "Unexpected shape of input pattern: {}".format(input_pattern.shape)
+            )
+        xi_new = input_pattern.reshape(self.N, -1)
+        evict = self.select_evictions(xi_new.shape[1])
+        downdates = self.weights.downdates
+        if evict.size == 0:
+            self.weights.add_patterns(xi_new)
+        elif downdates:  # forget and learn in one pass
+            self.weights.update_patterns(xi_new, self.xi[:, evict], evict)
+        if evict.size != 0:
+            self.compact_patterns(evict)
+        self.append_patterns(xi_new)
+        if evict.size != 0 and not downdates:
+            self.build_dense_weights()  # train the remaining patterns again
+        self.select_storage()
+        self.weights_changed()
+
+    def train_patterns(self, chunks):
+        # Streaming training from an iterable of patterns (N,) or chunks of
+        # patterns (N, k), e.g. a generator reading from disk. Dense weights
+        # are updated in place, so the peak memory stays at about the weights
+        # plus one chunk.
+        for chunk in chunks:
+            self.train_pattern(np.asarray(chunk))
 
     def remove_pattern(self, i):
         if i < self.p:
-            self.w -= construct_hebb_matrix(self.xi[:, i])
-            self.xi = np.delete(self.xi, i, axis=1)
-            self.p = self.xi.shape[1]
+            self.remove_patterns([i])
         else:
             print("There is no pattern to remove!")
 
+    def remove_patterns(self, indices):
+        # Removes the patterns with the given indices (or boolean mask of
+        # length p) with a single downdate of the weights. The remaining
+        # patterns keep their order.
+        remove = np.unique(self.pattern_indices(indices))
+        if remove.size == 0:
+            return
+        downdates = self.weights.downdates
+        if downdates:
+            self.weights.remove_patterns(self.xi[:, remove], remove)
+        self.compact_patterns(remove)
+        if not downdates:
+            self.build_dense_weights()  # train the remaining patterns again
+        self.select_storage()
+        self.weights_changed()
+
+    def replace_patterns(self, indices, xi_new):
+        # Replaces the patterns with the given indices (or boolean mask) by
+        # the columns of xi_new, removing and training in one pass.
+        index = self.pattern_indices(indices)
+        xi_new = np.asarray(xi_new).reshape(self.N, -1)
+        if xi_new.shape[1] != index.size or np.unique(index).size != index.size:
+            raise ValueError(
+                "Unexpected shape of input pattern: {}".format(xi_new.shape)
+            )
+        downdates = self.weights.downdates
+        if downdates:
+            self.weights.update_patterns(xi_new, self.xi[:, index], index, index)
+        self.xi_buffer[:, index] = xi_new
+        self.usage_buffer[index] = 0
+        if self.packed_xi_cache is not None:
+            self.packed_xi_cache[index] = pack_states(xi_new.T)
+        if not downdates:
+            self.build_dense_weights()  # train all patterns again
+        self.weights_changed()
+
+    def record_usage(self, S):
+        # counts a use of every saved pattern (or its inverse) which equals a
+        # state of S (N,) or (B, N), the least used patterns are evicted first
+        if self.p == 0:
+            return
+        index, d = self.nearest_pattern(S, inverse=True)
+        np.add.at(self.usage_buffer, np.atleast_1d(index)[np.atleast_1d(d) == 0], 1)
+
     def set_initial_neurons_state(self, S_initial):  # uses S_initial in place
         if len(S_initial.shape) != 1 or S_initial.shape[0] != self.N:
             raise ValueError(
@@ -51,69 +336,307 @@ class HopfieldNetwork:
             )
         self.t = 0  # reset timer1 for new initial state vector
         self.S = S_initial  # set new initial neuron state
+        self.state_changed()
+
+    def weights_changed(self):  # cached results of the old weights are invalid
+        self.weights_version = next(WEIGHTS_VERSIONS)
+        self.state_changed()
 
-    def update_neurons(self, iterations, mode, run_max=False):
+    def state_changed(self, h=None):
+        # S or the weights changed, h = weights.local_field(S) if known. Call
+        # it (or set_initial_neurons_state) after changing S in place.
+        self.h = h
+        self.energy_cache = None
+
+    @property
+    def energy(self):  # energy of S, kept up to date by the updates
+        if self.energy_cache is None:
+            if self.h is None:
+                self.h = self.weights.local_field(self.S, self.xi)
+            self.energy_cache = -0.5 * self.weights.scale * np.dot(self.S, self.h)
+        return self.energy_cache
+
+    def update_neurons(self, iterations, mode, run_max=False, max_iterations=None):
+        # With run_max the dynamics continue until a fixed point, a 2-cycle
+        # (sync) or at most max_iterations further sweeps (None: no limit).
+        # Returns and stores the reason: "fixed_point", "oscillating" or
+        # "max_iterations" (the sweeps ran out without convergence).
+        cache = self.recall_cache if run_max else None
+        if cache is not None:  # results of earlier calls from the same state
+            key = cache.key(self.S, mode, iterations, max_iterations)
+            entry = cache.get(key, self.weights_version)
+            if entry is not None:
+                return self.replay_update(*entry)
+            t = self.t
         self.t += iterations
-        if mode == "async":
+        if self.instrumentation is not None:
+            self.instrumentation.begin(mode)
+        if mode == "async":  # converged if a sweep flips no neuron
+            h = self.local_field_for_update(self.S)  # updated with flips
+            flips = None
             for _ in range(iterations):
-                for i in np.random.permutation(self.N):  # semi-random
-                    self.S[i] = sign_0(np.dot(self.w[i, :], self.S))
-            if run_max:
-                while True:
-                    last_S = np.copy(self.S)
-                    for i in np.random.permutation(self.N):  # semi-random
-                        self.S[i] = sign_0(np.dot(self.w[i, :], self.S))
-                    if np.array_equal(last_S, self.S):
-                        return
-                    self.t += 1
-
+                flips = self.instrumented_async_sweep(h)
+            n = 0
+            while run_max and (max_iterations is None or n < max_iterations):
+                flips = self.instrumented_async_sweep(h)
+                n += 1
+                if flips == 0:
+                    break
+                self.t += 1
+            termination = "fixed_point" if flips == 0 else "max_iterations"
+            self.state_changed(h)
         elif mode == "sync":
+            # states at t - 1, t and t + 1 in three reused buffers
+            last_S = np.zeros(self.N, dtype="int8")  # zeros never match
+            S = np.array(self.S, dtype="int8")
+            new_S = np.empty(self.N, dtype="int8")
+            termination = "max_iterations"
             for _ in range(iterations):
-                self.S = sign_0(np.dot(self.w, self.S))
-            if run_max:
-                while True:
-                    second_last_S = np.copy(self.S)
-                    for i in range(2):
-                        last_S = np.copy(self.S)
-                        self.S = sign_0(np.dot(self.w, self.S))
-                        if np.array_equal(last_S, self.S):
-                            return
-                        self.t += 1
-                    if np.array_equal(second_last_S, self.S):
-                        # print('Reached oscillating neuron state.')
-                        return  # break if oscillating
+                termination = self.sync_step(last_S, S, new_S)
+                last_S, S, new_S = S, new_S, last_S
+            n = 0
+            while run_max and (max_iterations is None or n < max_iterations):
+                termination = self.sync_step(last_S, S, new_S)
+                last_S, S, new_S = S, new_S, last_S
+                n += 1
+                if termination == "fixed_point":
+                    break
+                self.t += 1
+                if termination == "oscillating":
+                    break
+            self.S = S
+            # the fields of the last step belong to S only at a fixed point
+            self.state_changed(self.sync_h if termination == "fixed_point" else None)
+        else:
+            raise ValueError("Unkown mode: {}".format(mode))
+        self.termination = termination
+        if self.instrumentation is not None:
+            self.instrumentation.end(termination)
+        if cache is not None:
+            cache.put(key, self.S, self.t - t, termination)
+        if run_max and self.eviction == "least_used":
+            self.record_usage(self.S)
+        return termination
+
+    def replay_update(self, packed_S, dt, termination):  # cached update_neurons
+        self.S = unpack_states(packed_S, self.N)
+        self.t += dt
+        self.state_changed()
+        self.termination = termination
+        if self.eviction == "least_used":
+            self.record_usage(self.S)
+        return termination
+
+    def sync_step(self, last_S, S, new_S):
+        # new_S = sign_0(w S) written into the buffer new_S, returns whether
+        # the states ended in a fixed point, a 2-cycle or neither of them
+        if self.instrumentation is not None:
+            start = time.perf_counter()
+        h = self.sync_h = self.local_field_for_update(S)
+        np.greater_equal(h, -1e-15, out=new_S, casting="unsafe")
+        new_S *= 2
+        new_S -= 1
+        if self.instrumentation is not None:
+            self.S = new_S  # the energy is recorded for the new state
+            flips = np.count_nonzero(new_S != S)
+            self.instrumentation.sweep(self, flips, time.perf_counter() - start)
+        if np.array_equal(new_S, S):
+            return "fixed_point"
+        if np.array_equal(new_S, last_S):
+            return "oscillating"
+        return "max_iterations"
 
     def update_neurons_with_finite_temp(self, iterations, mode, beta):
         self.t += iterations
+        beta_scaled = beta * self.weights.scale  # for unscaled local fields
+        if self.instrumentation is not None:
+            self.instrumentation.begin(mode)
         if mode == "async":
+            h = self.local_field_for_update(self.S)  # updated with flips
             for _ in range(iterations):
-                for i in np.random.permutation(self.N):  # semi-random
-                    self.S[i] = (
-                        2
-                        * (
-                            1 / (1 + np.exp(-2 * beta * np.dot(self.w[i, :], self.S)))
-                            >= np.random.rand(1)
-                        )
-                        - 1
-                    )
+                theta = glauber_threshold(self.rng.random(self.N), beta_scaled)
+                self.instrumented_async_sweep(h, theta)
+            self.state_changed(h)
         elif mode == "sync":
             for _ in range(iterations):
-                self.S = (
-                    2
-                    * (
-                        1 / (1 + np.exp(-2 * beta * np.dot(self.w, self.S)))
-                        >= np.random.rand(self.N)
-                    )
-                    - 1
-                )
+                if self.instrumentation is not None:
+                    start, last_S = time.perf_counter(), self.S
+                theta = glauber_threshold(self.rng.random(self.N), beta_scaled)
+                h = self.local_field_for_update(self.S)
+                self.S = np.where(h >= theta, 1, -1)
+                if self.instrumentation is not None:
+                    flips = np.count_nonzero(self.S != last_S)
+                    elapsed = time.perf_counter() - start
+                    self.instrumentation.sweep(self, flips, elapsed)
+            self.state_changed()
         else:
             raise ValueError("Unkown mode: {}".format(mode))
+        if self.instrumentation is not None:
+            self.instrumentation.end()
+
+    def simulate_replicas(
+        self,
+        S_initial,
+        beta_vec,
+        iterations,
+        mode="async",
+        n_replicas=1,
+        tempering=False,
+    ):
+        # Finite temperature dynamics of n_replicas replicas for every inverse
+        # temperature of beta_vec in one (K * R, N) array, the network state S
+        # is not changed. With tempering, replicas at neighbouring temperatures
+        # exchange their states after every iteration (parallel tempering).
+        if mode not in ("async", "sync"):
+            raise ValueError("Unkown mode: {}".format(mode))
+        beta_vec = np.atleast_1d(np.asarray(beta_vec, dtype="float64"))
+        K, R = beta_vec.size, n_replicas
+        S = np.array(np.broadcast_to(S_initial, (K, R, self.N)), dtype="int8")
+        S = S.reshape(K * R, self.N)
+        beta_scaled = np.repeat(beta_vec, R)[:, np.newaxis] * self.weights.scale
+        h = self.weights.local_field(S, self.xi)
+        for t in range(iterations):
+            theta = glauber_threshold(self.rng.random(S.shape), beta_scaled)
+            if mode == "async":  # every replica with its own neuron order
+                self.batch_async_sweep(S, h, theta)
+            else:
+                S = np.where(h >= theta, 1, -1).astype("int8")
+                h = self.weights.local_field(S, self.xi)
+            if tempering and K > 1:
+                E = -0.5 * self.weights.scale * np.sum(S * h, axis=1).reshape(K, R)
+                self.swap_replicas(S, h, E, beta_vec, offset=t % 2)
+        E = -0.5 * self.weights.scale * np.sum(S * h, axis=1)
+        return ReplicaResult(S.reshape(K, R, self.N), E.reshape(K, R))
 
-    def compute_energy(self, S):
-        return -0.5 * np.einsum("i,ij,j", S, self.w, S)
+    def swap_replicas(self, S, h, E, beta_vec, offset):
+        # Metropolis exchange of the states of replica r at the temperatures
+        # k and k + 1 for k = offset, offset + 2, ..., S and h are swapped in
+        # place, E has the shape (K, R).
+        K, R = E.shape
+        k = np.arange(offset, K - 1, 2)
+        d_beta = beta_vec[k] - beta_vec[k + 1]
+        log_accept = d_beta[:, np.newaxis] * (E[k] - E[k + 1])
+        accept = np.log(self.rng.random(log_accept.shape)) < log_accept
+        a = (k[:, np.newaxis] * R + np.arange(R))[accept]
+        b = a + R
+        S[np.concatenate((a, b))] = S[np.concatenate((b, a))]
+        h[np.concatenate((a, b))] = h[np.concatenate((b, a))]
+
+    def recall_batch(self, S_batch, mode="sync", max_iterations=100):
+        S = np.array(S_batch, dtype="int8", ndmin=2)  # copy, probes stay untouched
+        if len(S.shape) != 2 or S.shape[1] != self.N:
+            raise ValueError(
+                "Unexpected shape/size of probe states: {}".format(S.shape)
+            )
+        B = S.shape[0]  # number of probes
+        t = np.zeros(B, dtype="int")
+        fixed_point = np.zeros(B, dtype="bool")
+        oscillating = np.zeros(B, dtype="bool")
+        active = np.arange(B)  # probes which have not converged yet
+        if mode == "sync":
+            last_S = np.zeros_like(S)  # state at t - 1, zeros never match
+            for _ in range(max_iterations):
+                if active.size == 0:
+                    break
+                current_S = S[active]
+                new_S = sign_0(self.weights.local_field(current_S, self.xi))
+                new_S = new_S.astype("int8")
+                fixed = np.all(new_S == current_S, axis=1)
+                cycle = ~fixed & np.all(new_S == last_S[active], axis=1)
+                last_S[active] = current_S
+                S[active] = new_S
+                t[active[~fixed]] += 1
+                fixed_point[active[fixed]] = True
+                oscillating[active[cycle]] = True
+                active = active[~(fixed | cycle)]
+        elif mode == "async":
+            h = self.weights.local_field(S, self.xi)  # fields of all probes
+            for _ in range(max_iterations):
+                if active.size == 0:
+                    break
+                current_S = S[active]
+                current_h = h[active]
+                fixed = ~self.batch_async_sweep(current_S, current_h)
+                S[active] = current_S
+                h[active] = current_h
+                t[active[~fixed]] += 1
+                fixed_point[active[fixed]] = True
+                active = active[~fixed]
+        else:
+            raise ValueError("Unkown mode: {}".format(mode))
+        if self.eviction == "least_used":
+            self.record_usage(S)
+        return RecallResult(S, t, fixed_point, oscillating)
+
+    def batch_async_sweep(self, S, h, theta=None):
+        # Asynchronous sweep of every state of S (B, N) in place, each with its
+        # own random neuron order, so equal states still evolve independently.
+        # h = weights.local_field(S) is updated in place, theta (B, N) are the
+        # thresholds (None: zero temperature). Returns which states flipped.
+        B = S.shape[0]
+        states = np.arange(B)
+        orders = np.argsort(self.rng.random((B, self.N)), axis=1)
+        flipped = np.zeros(B, dtype="bool")
+        for i in orders.T:  # neuron i[b] of state b
+            if theta is None:
+                new_S_i = sign_0(h[states, i])
+            else:
+                new_S_i = np.where(h[states, i] >= theta[states, i], 1, -1)
+            changed = np.flatnonzero(new_S_i != S[states, i])
+            if changed.size != 0:
+                i_changed = i[changed]
+                delta = new_S_i[changed] - S[changed, i_changed]
+                h[changed] += delta[:, np.newaxis] * self.weights.row(
+                    i_changed, self.xi
+                )
+                S[changed, i_changed] = new_S_i[changed]
+                flipped[changed] = True
+        return flipped
+
+    def compute_local_field(self, S):  # S: single state (N,) or batch (B, N)
+        return self.weights.scale * self.weights.local_field(S, self.xi)
+
+    def local_field_for_update(self, S):  # unscaled w S, counted if instrumented
+        if self.instrumentation is not None:
+            self.instrumentation.matvec()
+        return self.weights.local_field(S, self.xi)
+
+    def instrumented_async_sweep(self, h, theta=-1e-15):
+        if self.instrumentation is None:
+            return self.async_sweep(h, theta=theta)
+        start = time.perf_counter()
+        flips = self.async_sweep(h, theta=theta)
+        self.instrumentation.sweep(self, flips, time.perf_counter() - start, h)
+        return flips
+
+    def async_sweep(self, h, order=None, theta=-1e-15):
+        # h = weights.local_field(S), updated in place
+        if order is None:
+            order = self.rng.permutation(self.N)  # semi-random
+        return async_sweep(
+            self.S,
+            h,
+            order,
+            lambda h, i, factor: self.weights.add_row(h, i, factor, self.xi),
+            theta,
+        )
+
+    @property
+    def packed_xi(self):  # saved patterns as bit-packed rows
+        if self.packed_xi_cache is None:
+            self.packed_xi_cache = pack_states(self.xi.T)
+        return self.packed_xi_cache
+
+    def nearest_pattern(self, S, inverse=False):  # S: (N,) or batch (B, N)
+        if self.p == 0:
+            raise ValueError("There are no saved patterns.")
+        return nearest_pattern(pack_states(S), self.packed_xi, self.N, inverse)
+
+    def compute_energy(self, S):  # full recompute, see energy for the state S
+        return -0.5 * np.dot(S, self.compute_local_field(S))
 
     def check_stability(self, S):  # stability condition
-        return np.array_equal(S, sign_0(np.dot(self.w, S)))
+        return np.array_equal(S, sign_0(self.weights.local_field(S, self.xi)))
 
 
 def construct_hebb_matrix(xi):
@@ -128,6 +651,48 @@ def construct_hebb_matrix(xi):
     return w
 
 
+def async_sweep(S, h, order, add_row, theta=-1e-15, block_size=32):
+    # Update the neurons of S in the given order, where h = w S holds the
+    # local fields. Neuron order[k] becomes +1 if its local field is at least
+    # theta[k] (a scalar theta applies to all, the default equals sign_0).
+    # Instead of a dot product per neuron, the next neuron that changes its
+    # state is searched in vectorized blocks and only a flip updates h by one
+    # row of the (symmetric) weight matrix, add_row(h, i, factor) adds factor
+    # times row i to h. A sweep costs O(N * flips), O(k * flips) for sparse
+    # weights with k connections per neuron.
+    # Returns the number of flipped neurons.
+    flips = 0
+    start = 0
+    n = len(order)
+    theta = np.broadcast_to(theta, (n,))
+    size = block_size
+    while start < n:
+        block = order[start : start + size]
+        new_S = np.where(h[block] >= theta[start : start + size], 1, -1)
+        unstable = np.flatnonzero(new_S != S[block])
+        if unstable.size == 0:
+            start += size
+            size *= 2  # stable region, look further ahead
+            continue
+        i = block[unstable[0]]
+        new_S_i = new_S[unstable[0]]
+        add_row(h, i, new_S_i - S[i])
+        S[i] = new_S_i
+        flips += 1
+        start += unstable[0] + 1
+        size = block_size
+    return flips
+
+
+def glauber_threshold(u, beta):
+    # Neuron i becomes +1 with probability 1 / (1 + exp(-2 beta h_i)), i.e. if
+    # (1 + tanh(beta h_i)) / 2 >= u for uniform random numbers u. Solved for
+    # h_i this is h_i >= artanh(2 u - 1) / beta, which never overflows.
+    with np.errstate(divide="ignore", invalid="ignore"):
+        theta = np.arctanh(2 * u - 1) / beta
+    return np.where(beta > 0, theta, np.where(u <= 0.5, -np.inf, np.inf))
+
+
 def hamming_distance(x, y):
     return np.sum(x != y)
 
@@ -0,0 +1,117 @@
+from __future__ import division
+import numpy as np
+from .libary import HopfieldNetwork, RecallResult, sign_0
+
+# Modern (dense associative memory) Hopfield network with the continuous
+# update s -> xi softmax(beta xi^T s). The saved patterns are the only
+# parameters, so memory and one update cost O(N p) and a single update
+# usually retrieves a pattern, far beyond the capacity of the Hebbian network.
+
+
+class ModernHopfieldNetwork(HopfieldNetwork):
+    def __init__(
+        self,
+        N=100,
+        filepath=None,
+        beta=1.0,
+        top_k=None,
+        rng=None,
+        max_load=None,
+        eviction="oldest",
+    ):
+        self.beta = beta  # inverse temperature of the softmax
+        self.top_k = top_k  # softmax over the top_k largest overlaps only
+        HopfieldNetwork.__init__(
+            self,
+            N=N,
+            filepath=filepath,
+            storage="lowrank",  # keeps xi only, the weights are never built
+            rng=rng,
+            max_load=max_load,
+            eviction=eviction,
+        )
+
+    def retrieve(self, S):
+        # One update xi softmax(beta xi^T S) of a state (N,) or of states as
+        # rows (B, N), returns the continuous states.
+        if self.p == 0:
+            raise ValueError("There are no saved patterns.")
+        xi = self.weights.float_patterns(self.xi)
+        scores = self.beta * np.dot(S, xi)  # (p,) or (B, p)
+        if self.top_k is None or self.top_k >= self.p:
+            return np.dot(softmax(scores), xi.T)
+        index = np.argpartition(scores, -self.top_k, axis=-1)[..., -self.top_k :]
+        probabilities = softmax(np.take_along_axis(scores, index, axis=-1))
+        return np.einsum("...k,...kn->...n", probabilities, xi.T[index])
+
+    def update_neurons(
+        self, iterations, mode="sync", run_max=False, max_iterations=None
+    ):
+        # All neurons are updated at once by retrieve, mode is ignored. The
+        # state stays +-1, the sign of the continuous update.
+        self.t += iterations
+        termination = "max_iterations"
+        for _ in range(iterations):
+            termination = self.retrieve_step()
+        n = 0
+        while run_max and (max_iterations is None or n < max_iterations):
+            termination = self.retrieve_step()
+            n += 1
+            if termination == "fixed_point":
+                break
+            self.t += 1
+        self.termination = termination
+        if run_max and self.eviction == "least_used":
+            self.record_usage(self.S)
+        return termination
+
+    def retrieve_step(self):
+        new_S = sign_0(self.retrieve(self.S)).astype("int8")
+        fixed = np.array_equal(new_S, self.S)
+        self.S = new_S
+        self.state_changed()
+        return "fixed_point" if fixed else "max_iterations"
+
+    def recall_batch(self, S_batch, mode="sync", max_iterations=100):
+        S = np.array(S_batch, dtype="int8", ndmin=2)  # copy, probes stay untouched
+        if len(S.shape) != 2 or S.shape[1] != self.N:
+            raise ValueError(
+                "Unexpected shape/size of probe states: {}".format(S.shape)
+            )
+        B = S.shape[0]
+        t = np.zeros(B, dtype="int")
+        fixed_point = np.zeros(B, dtype="bool")
+        active = np.arange(B)  # probes which have not converged yet
+        for _ in range(max_iterations):
+            if active.size == 0:
+                break
+            new_S = sign_0(self.retrieve(S[active])).astype("int8")
+            fixed = np.all(new_S == S[active], axis=1)
+            S[active] = new_S
+            t[active[~fixed]] += 1
+            fixed_point[active[fixed]] = True
+            active = active[~fixed]
+        if self.eviction == "least_used":
+            self.record_usage(S)
+        return RecallResult(S, t, fixed_point, np.zeros(B, dtype="bool"))
+
+    @property
+    def energy(self):  # energy of S, cached until S or the patterns change
+        if self.energy_cache is None:
+            self.energy_cache = self.compute_energy(self.S)
+        return self.energy_cache
+
+    def compute_energy(self, S):
+        # E = -lse(beta, xi^T S) / beta + S^T S / 2 without constant terms
+        scores = self.beta * np.dot(S, self.weights.float_patterns(self.xi))
+        m = np.max(scores, axis=-1)
+        lse = m + np.log(np.sum(np.exp(scores - m[..., np.newaxis]), axis=-1))
+        return -lse / self.beta + 0.5 * np.sum(np.square(S, dtype="float64"), axis=-1)
+
+    def check_stability(self, S):
+        return np.array_equal(S, sign_0(self.retrieve(S)))
+
+
+def softmax(x):  # along the last axis, shifted by the maximum against overflow
+    e = np.exp(x - np.max(x, axis=-1, keepdims=True))
+    return e / np.sum(e, axis=-1, keepdims=True)
@@ -0,0 +1,100 @@
+from __future__ import division
+import json
+import os
+import struct
+import tempfile
+import numpy as np
+
+# Network files (.hfn) with named arrays that can be memory-mapped:
+#
+#   magic | header length (uint32, little endian) | JSON header | arrays
+#
+# The JSON header holds the format version, free attributes and for every
+# array its dtype, shape and byte offset. Arrays are stored raw in C order at
+# offsets aligned to ALIGNMENT bytes, so np.memmap opens them without reading
+# or copying and several processes share the page cache of one file.
+
+MAGIC = b"\x93HOPFIELD"
+VERSION = 1
+ALIGNMENT = 64
+EXTENSION = ".hfn"
+
+
+def is_network_file(filepath):
+    with open(filepath, "rb") as file:
+        return file.read(len(MAGIC)) == MAGIC
+
+
+def save_network_file(filepath, arrays, attrs=None):
+    arrays = {name: np.ascontiguousarray(array) for name, array in arrays.items()}
+    header = {"version": VERSION, "attrs": attrs or {}, "arrays": {}}
+    offset = 0
+    for name, array in arrays.items():  # offsets relative to the data start
+        header["arrays"][name] = {
+            "dtype": array.dtype.str,
+            "shape": array.shape,
+            "offset": offset,
+        }
+        offset = aligned(offset + array.nbytes)
+    header_bytes = json.dumps(header).encode("utf-8")
+    data_start = aligned(len(MAGIC) + 4 + len(header_bytes))
+    header_bytes += b" " * (data_start - len(MAGIC) - 4 - len(header_bytes))
+    # written to a new file which replaces filepath, memory maps of the old
+    # file (e.g. the arrays of the network being saved) keep its contents
+    directory = os.path.dirname(os.path.abspath(os.fspath(filepath)))
+    fd, tmp_path = tempfile.mkstemp(suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as file:
+            file.write(MAGIC)
+            file.write(struct.pack("<I", len(header_bytes)))
+            file.write(header_bytes)
+            for name, array in arrays.items():
+                file.seek(data_start + header["arrays"][name]["offset"])
+                file.write(array.tobytes())
+        os.chmod(tmp_path, file_mode(filepath))
+        os.replace(tmp_path, filepath)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def load_network_file(filepath, mmap_mode="c"):
+    # Returns the arrays as dict of memory maps (mmap_mode "r", "c" or "r+")
+    # or of arrays in memory (mmap_mode None), and the attributes.
+    with open(filepath, "rb") as file:
+        if file.read(len(MAGIC)) != MAGIC:
+            raise ValueError("Not a Hopfield network file: {}".format(filepath))
+        (header_length,) = struct.unpack("<I", file.read(4))
+        header = json.loads(file.read(header_length).decode("utf-8"))
+        if header["version"] > VERSION:
+            raise ValueError(
+                "Unsupported network file version: {}".format(header["version"])
+            )
+        data_start = len(MAGIC) + 4 + header_length
+        arrays = {}
+        for name, spec in header["arrays"].items():
+            dtype, shape = np.dtype(spec["dtype"]), tuple(spec["shape"])
+            offset = data_start + spec["offset"]
+            if mmap_mode is None or 0 in shape:  # np.memmap needs data
+                file.seek(offset)
+                count = int(np.prod(shape))
+                array = np.fromfile(file, dtype=dtype, count=count).reshape(shape)
+            else:
+                array = np.memmap(
+                    filepath, dtype=dtype, mode=mmap_mode, offset=offset, shape=shape
+                )
+            arrays[name] = array
+    return arrays, header["attrs"]
+
+
+def file_mode(filepath):  # of the existing file, else as created by open()
+    try:
+        return os.stat(filepath).st_mode & 0o777
+    except FileNotFoundError:
+        umask = os.umask(0)
+        os.umask(umask)
+        return 0o666 & ~umask
+
+
+def aligned(n):
+    return -(-n // ALIGNMENT) * ALIGNMENT
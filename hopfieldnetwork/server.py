@@ -0,0 +1,376 @@
+from __future__ import division, print_function
+import argparse
+import json
+import os
+import queue
+import sys
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import Future, ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.request import Request, urlopen
+import numpy as np
+from .libary import HopfieldNetwork
+
+# Recall server for a saved network:
+#
+#   hopfieldnetwork-server network.hfn --port 8000 --workers 4 --max-wait 5
+#
+#   POST /recall  {"states": [[1, -1, ...], ...], "mode": "sync",
+#                  "max_iterations": 100}
+#             ->  {"states": [...], "nearest": [...], "distance": [...],
+#                  "t": [...], "fixed_point": [...], "oscillating": [...]}
+#   GET  /info    {"N": ..., "p": ..., "workers": ...}
+#
+# Probe states of another shape or with values other than -1 and 1 get 400.
+# Probes of concurrent requests are collected into micro-batches (up to
+# max_batch probes, waiting at most max_wait for more) and recalled with one
+# recall_batch, i.e. one matrix product per iteration for all of them. While
+# all workers are busy, further requests queue up for the next batch. Every
+# worker process opens the network itself, .hfn files as memory maps, so all
+# workers share the weights in the page cache. With workers=0 the batches are
+# recalled in the server process. If a worker dies, the requests of its batch
+# get an error (503) and a new pool of workers is started. recall() is a
+# client for the server.
+
+MAX_BATCH = 256  # probes per batch
+MAX_WAIT = 0.005  # s to wait for more probes after the first one of a batch
+TIMEOUT = 60.0  # s until a request without response fails (503)
+
+# response of the server: final states, nearest saved patterns and their
+# Hamming distances, iterations per probe and flags as in RecallResult
+RecallResponse = namedtuple(
+    "RecallResponse",
+    ["S", "nearest", "distance", "t", "fixed_point", "oscillating"],
+)
+
+hopfield_network = None  # network of a worker process
+
+
+def init_worker(filepath):
+    global hopfield_network
+    hopfield_network = HopfieldNetwork(filepath=filepath)
+
+
+def recall_probes(probes, mode, max_iterations, network=None):
+    # RecallResponse of a batch of probes (B, N), in a worker process with its
+    # network or with the given one
+    network = hopfield_network if network is None else network
+    result = network.recall_batch(probes, mode, max_iterations)
+    nearest, distance = network.nearest_pattern(result.S)
+    return RecallResponse(
+        result.S, nearest, distance, result.t, result.fixed_point, result.oscillating
+    )
+
+
+class BatchRequest(object):  # probes of one request and its pending response
+    def __init__(self, probes, mode, max_iterations):
+        self.probes = probes
+        self.key = (mode, max_iterations)
+        self.future = Future()
+
+
+class MicroBatcher(object):
+    # Collects the probes of concurrent submit calls into batches for
+    # recall(probes, mode, max_iterations), at most n_slots batches run at
+    # once in the executor of new_executor() (None: in the thread of the
+    # batcher). A broken executor is replaced by a new one.
+    def __init__(
+        self,
+        recall,
+        max_batch=MAX_BATCH,
+        max_wait=MAX_WAIT,
+        new_executor=None,
+        n_slots=1,
+    ):
+        self.recall = recall
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.new_executor = new_executor
+        self.executor = None if new_executor is None else new_executor()
+        self.slots = threading.Semaphore(n_slots)
+        self.requests = queue.Queue()
+        self.thread = threading.Thread(target=self.run)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def submit(self, probes, mode="sync", max_iterations=100):
+        request = BatchRequest(probes, mode, max_iterations)
+        self.requests.put(request)
+        return request.future
+
+    def close(self):
+        self.requests.put(None)
+        self.thread.join()
+        if self.executor is not None:
+            self.executor.shutdown()
+
+    def run(self):
+        while True:
+            self.slots.acquire()  # wait for a free worker before collecting
+            request = self.requests.get()
+            if request is None:
+                return
+            batch = [request]
+            size = len(request.probes)
+            deadline = time.monotonic() + self.max_wait
+            while size < self.max_batch:
+                try:
+                    request = self.requests.get(
+                        timeout=max(0.0, deadline - time.monotonic())
+                    )
+                except queue.Empty:
+                    break
+                if request is None:
+                    self.requests.put(None)  # close after this batch
+                    break
+                batch.append(request)
+                size += len(request.probes)
+            self.dispatch(batch)
+
+    def dispatch(self, batch):
+        # one recall per mode and max_iterations, the slot is released when
+        # the last of them finished
+        groups = {}
+        for request in batch:
+            groups.setdefault(request.key, []).append(request)
+        remaining = [len(groups)]
+        lock = threading.Lock()
+
+        def done(group, future):
+            resolve(group, future)
+            with lock:
+                remaining[0] -= 1
+                if remaining[0] == 0:
+                    self.slots.release()
+
+        for key, group in groups.items():
+            probes = np.concatenate([request.probes for request in group])
+            if self.executor is None:
+                future = Future()
+                try:
+                    future.set_result(self.recall(probes, *key))
+                except Exception as error:
+                    future.set_exception(error)
+                done(group, future)
+            else:
+                future = self.submit_batch(probes, key)
+                future.add_done_callback(
+                    lambda future, group=group: done(group, future)
+                )
+
+    def submit_batch(self, probes, key):  # future of the recall, never raises
+        try:
+            return self.executor.submit(self.recall, probes, *key)
+        except BrokenProcessPool:  # a worker died, start a new pool
+            self.executor.shutdown(wait=False)
+            try:
+                self.executor = self.new_executor()
+                return self.executor.submit(self.recall, probes, *key)
+            except Exception as error:
+                future = Future()
+                future.set_exception(error)
+                return future
+        except Exception as error:
+            future = Future()
+            future.set_exception(error)
+            return future
+
+
+def resolve(group, future):  # splits the response of a batch to its requests
+    error = future.exception()
+    start = 0
+    for request in group:
+        if error is not None:
+            request.future.set_exception(error)
+            continue
+        stop = start + len(request.probes)
+        request.future.set_result(
+            RecallResponse(*[array[start:stop] for array in future.result()])
+        )
+        start = stop
+
+
+class RecallServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128  # pending connections of concurrent clients
+
+    def __init__(
+        self,
+        address,
+        filepath,
+        workers=1,
+        max_batch=MAX_BATCH,
+        max_wait=MAX_WAIT,
+        verbose=False,
+        timeout=TIMEOUT,
+    ):
+        self.hopfield_network = HopfieldNetwork(filepath=filepath)
+        self.workers = workers
+        self.verbose = verbose
+        self.request_timeout = timeout
+        if workers > 0:
+
+            def new_executor():
+                return ProcessPoolExecutor(
+                    workers, initializer=init_worker, initargs=(filepath,)
+                )
+
+            recall = recall_probes
+        else:
+            new_executor = None
+
+            def recall(probes, mode, max_iterations):
+                return recall_probes(
+                    probes, mode, max_iterations, self.hopfield_network
+                )
+
+        self.batcher = MicroBatcher(
+            recall, max_batch, max_wait, new_executor, max(1, workers)
+        )
+        ThreadingHTTPServer.__init__(self, address, RecallRequestHandler)
+
+    def server_close(self):
+        ThreadingHTTPServer.server_close(self)
+        self.batcher.close()
+
+
+class RecallRequestHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path != "/info":
+            return self.send_json(404, {"error": "Unknown path: " + self.path})
+        hopfield_network = self.server.hopfield_network
+        self.send_json(
+            200,
+            {
+                "N": hopfield_network.N,
+                "p": hopfield_network.p,
+                "workers": self.server.workers,
+            },
+        )
+
+    def do_POST(self):
+        if self.path != "/recall":
+            return self.send_json(404, {"error": "Unknown path: " + self.path})
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            body = json.loads(self.rfile.read(length).decode("utf-8"))
+            probes = np.array(body["states"], dtype="float64", ndmin=2)
+            mode = body.get("mode", "sync")
+            max_iterations = int(body.get("max_iterations", 100))
+            N = self.server.hopfield_network.N
+            if len(probes.shape) != 2 or probes.shape[1] != N:
+                raise ValueError(
+                    "Unexpected shape/size of probe states: {}".format(probes.shape)
+                )
+            if not np.isin(probes, (-1, 1)).all():
+                raise ValueError("Probe states must only contain -1 and 1.")
+            probes = probes.astype("int8")
+            if mode not in ("sync", "async"):
+                raise ValueError("Unkown mode: {}".format(mode))
+        except (KeyError, TypeError, ValueError, OverflowError) as error:
+            return self.send_json(400, {"error": str(error)})
+        try:
+            response = self.server.batcher.submit(probes, mode, max_iterations)
+            response = response.result(timeout=self.server.request_timeout)
+        except TimeoutError:
+            return self.send_json(503, {"error": "Recall timed out."})
+        except BrokenProcessPool as error:  # the worker died, retry later
+            return self.send_json(503, {"error": str(error)})
+        except Exception as error:
+            return self.send_json(500, {"error": str(error)})
+        self.send_json(
+            200,
+            {
+                "states": response.S.tolist(),
+                "nearest": response.nearest.tolist(),
+                "distance": response.distance.tolist(),
+                "t": response.t.tolist(),
+                "fixed_point": response.fixed_point.tolist(),
+                "oscillating": response.oscillating.tolist(),
+            },
+        )
+
+    def send_json(self, status, content):
+        body = json.dumps(content).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            BaseHTTPRequestHandler.log_message(self, format, *args)
+
+
+def recall(url, states, mode="sync", max_iterations=100, timeout=None):
+    # Recalls a state (N,) or states (B, N) with the server at url, e.g.
+    # "http://127.0.0.1:8000". Returns a RecallResponse of arrays (B, ...).
+    body = json.dumps(
+        {
+            "states": np.asarray(states, dtype="int8").tolist(),
+            "mode": mode,
+            "max_iterations": max_iterations,
+        }
+    ).encode("utf-8")
+    request = Request(
+        url.rstrip("/") + "/recall",
+        data=body,
+        headers={"Content-Type": "application/json"},
+    )
+    with urlopen(request, timeout=timeout) as response:
+        content = json.loads(response.read().decode("utf-8"))
+    return RecallResponse(
+        np.array(content["states"], dtype="int8"),
+        np.array(content["nearest"], dtype="int64"),
+        np.array(content["distance"], dtype="int64"),
+        np.array(content["t"], dtype="int64"),
+        np.array(content["fixed_point"], dtype="bool"),
+        np.array(content["oscillating"], dtype="bool"),
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="hopfieldnetwork-server",
+        description="Recall server for a saved Hopfield network.",
+    )
+    parser.add_argument("filepath", help="saved network (.hfn or .npz)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument(
+        "--workers", type=int, default=os.cpu_count() or 1, help="0: no processes"
+    )
+    parser.add_argument("--max-batch", type=int, default=MAX_BATCH)
+    parser.add_argument(
+        "--max-wait", type=float, default=1000 * MAX_WAIT, help="in milliseconds"
+    )
+    parser.add_argument(
+        "--timeout", type=float, default=TIMEOUT, help="of a request in seconds"
+    )
+    parser.add_argument("--verbose", action="store_true", help="log every request")
+    args = parser.parse_args(argv)
+    server = RecallServer(
+        (args.host, args.port),
+        args.filepath,
+        args.workers,
+        args.max_batch,
+        args.max_wait / 1000,
+        args.verbose,
+        args.timeout,
+    )
+    print("Serving {} on http://{}:{}".format(args.filepath, *server.server_address))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -57,6 +57,47 @@ class ScrollSpinbox(tk.Spinbox):
             self.invoke("buttonup")
 
 
+class BlitImage(object):
+    # Redraws the image of a FigureCanvasTkAgg without rendering the whole
+    # figure: the image is animated, i.e. left out of full draws, and drawn
+    # onto a copy of the rest of the figure which is blitted to the canvas.
+    # The copy is taken after every full draw (also after resizes). Requests
+    # are coalesced into at most one redraw every interval ms.
+    def __init__(self, canvas, image, interval=16):
+        self.canvas = canvas
+        self.image = image
+        self.interval = interval
+        self.background = None
+        self.pending = None  # id of the scheduled redraw
+        self.full = False  # next redraw renders the whole figure
+        image.set_animated(True)
+        canvas.mpl_connect("draw_event", self.on_draw)
+
+    def on_draw(self, event):
+        self.background = self.canvas.copy_from_bbox(self.canvas.figure.bbox)
+        self.canvas.figure.draw_artist(self.image)
+
+    def set_data(self, data):
+        self.image.set_data(data)
+        self.request()
+
+    def request(self, full=False):  # full: axes, text or layout changed
+        self.full = self.full or full
+        if self.pending is None:
+            widget = self.canvas.get_tk_widget()
+            self.pending = widget.after(self.interval, self.redraw)
+
+    def redraw(self):
+        self.pending = None
+        if self.full or self.background is None:
+            self.full = False
+            self.canvas.draw()
+        else:
+            self.canvas.restore_region(self.background)
+            self.canvas.figure.draw_artist(self.image)
+            self.canvas.blit(self.canvas.figure.bbox)
+
+
 # check OS
 def checkOS():
     if sys.platform == "linux" or sys.platform == "linux2":
@@ -1,8 +1,9 @@
 from __future__ import division, print_function
+import hashlib
 import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
-import matplotlib.pyplot as plt
-from PIL import Image
 from .libary import HopfieldNetwork, hamming_distance
 
 
@@ -14,30 +15,86 @@ class AttrDict(dict):
 
 
 # Image to network file utilities
-def image2numpy_array(path, size):
+def image2numpy_array(path, size, threshold=None):
+    # Black and white image as array with +1 for black and -1 for white
+    # pixels. threshold: None for Floyd-Steinberg dithering (PIL's "1" mode),
+    # a gray value 0..255 or "mean", "median" or "otsu" of the gray values.
+    from PIL import Image  # imported here, PIL is slow to import
+
     img_pil = Image.open(path)
     img_pil = img_pil.resize(size)
-    img_pil = img_pil.convert("1")  # convert image to black and white
-    img_np = np.zeros(img_pil.size, dtype="uint8")
-    for i in range(img_pil.size[0]):
-        for j in range(img_pil.size[1]):
-            img_np[i, j] = img_pil.getpixel((i, j))
-    img_np = np.where(img_np <= 0, 1, -1)
-    return img_np.transpose()
+    if threshold is None:
+        img_np = np.asarray(img_pil.convert("1"))  # dithered black and white
+        return np.where(img_np, -1, 1).astype("int8")
+    gray = np.asarray(img_pil.convert("L"))
+    return np.where(gray < gray_threshold(gray, threshold), 1, -1).astype("int8")
+
+
+def gray_threshold(gray, threshold):
+    if threshold == "mean":
+        return gray.mean()
+    elif threshold == "median":
+        return np.median(gray)
+    elif threshold == "otsu":  # maximize the variance between both classes
+        histogram = np.bincount(gray.ravel(), minlength=256).astype("float64")
+        weight = np.cumsum(histogram)  # pixels below each gray value
+        mass = np.cumsum(histogram * np.arange(256))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            mean_0 = mass / weight
+            mean_1 = (mass[-1] - mass) / (weight[-1] - weight)
+            variance = weight * (weight[-1] - weight) * (mean_0 - mean_1) ** 2
+        return np.nanargmax(variance) + 1  # gray values above the maximum are white
+    elif isinstance(threshold, str):
+        raise ValueError("Unknown threshold: {}".format(threshold))
+    return threshold
+
 
+def image2pattern(path, size, threshold=None, cache_dir=None):
+    # image2numpy_array as flat pattern, cached in cache_dir by path, mtime,
+    # size and threshold of the image
+    if cache_dir is None:
+        return image2numpy_array(path, size, threshold).flatten()
+    path = os.path.abspath(path)
+    key = "{}:{}:{}:{}".format(path, os.stat(path).st_mtime_ns, size, threshold)
+    cache_path = os.path.join(
+        cache_dir, hashlib.sha1(key.encode("utf-8")).hexdigest() + ".npy"
+    )
+    if os.path.exists(cache_path):
+        return np.load(cache_path)
+    pattern = image2numpy_array(path, size, threshold).flatten()
+    os.makedirs(cache_dir, exist_ok=True)
+    # unique temporary file, concurrent writers of the same entry do not race
+    fd, tmp_path = tempfile.mkstemp(suffix=".tmp.npy", dir=cache_dir)
+    try:
+        with os.fdopen(fd, "wb") as file:
+            np.save(file, pattern)
+        os.replace(tmp_path, cache_path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    return pattern
 
-def images2xi(path_vec, N):
+
+def images2xi(path_vec, N, threshold=None, cache_dir=None, max_workers=None):
+    # images are decoded and resized in parallel, PIL releases the GIL there
     p = len(path_vec)
     xi = np.empty((N, p), dtype="int8")  # array with saved patterns
     N_sqrt = int(np.sqrt(N))
-    for i, filename in enumerate(path_vec):
-        xi[:, i] = image2numpy_array(filename, (N_sqrt, N_sqrt)).flatten()
+    paths = list(dict.fromkeys(path_vec))  # every image only once
+
+    def load(path):
+        return image2pattern(path, (N_sqrt, N_sqrt), threshold, cache_dir)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        patterns = dict(zip(paths, executor.map(load, paths)))
+    for i, path in enumerate(path_vec):
+        xi[:, i] = patterns[path]
     return xi
 
 
-def images2network_file(N, input_path_vec, output_path):
+def images2network_file(N, input_path_vec, output_path, threshold=None):
     hopfield_network = HopfieldNetwork(N=N)
-    xi = images2xi(input_path_vec, N)
+    xi = images2xi(input_path_vec, N, threshold)
     hopfield_network.train_pattern(xi)
     hopfield_network.save_network(output_path)
 
@@ -46,6 +103,8 @@ def images2network_file(N, input_path_vec, output_path):
 def plot_network_development(
     network, timesteps, mode, exact_state, outputpath, anno_hamming=True
 ):
+    import matplotlib.pyplot as plt  # imported here, matplotlib is slow to import
+
     fig, axarr = plt.subplots(1, timesteps)
     fig.set_size_inches(4 * timesteps, 4)
     N_sqrt = int(np.sqrt(network.N))
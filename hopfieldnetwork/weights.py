@@ -0,0 +1,414 @@
+from __future__ import division
+import numpy as np
+
+# Storage backends for the weight matrix of a Hopfield network. A backend
+# computes the (unscaled) local fields w S, single rows of w and the changes
+# of w when patterns are trained or removed. The physical weights are
+# scale * w, the network passes its saved patterns xi to every call.
+
+
+# dtypes of dense weights, float64 stores w = xi xi^T / N as before, all other
+# dtypes store the Hebbian counts xi xi^T and apply the factor 1 / N lazily
+WEIGHT_DTYPES = ("float64", "float32", "int32", "int16", "int8")
+BLOCK_BYTES = 2**23  # size of float64 temporaries when working in blocks
+
+
+class DenseWeights(object):  # full N x N weight matrix
+    storage = "dense"
+    downdates = True  # patterns can be removed by a downdate of the weights
+
+    def __init__(self, w, scale=1.0, n_patterns=0):
+        self.w = w
+        self.scale = scale
+        self.n_patterns = n_patterns  # bounds the magnitude of integer counts
+
+    @classmethod
+    def zeros(cls, N, dtype="float64"):
+        dtype = np.dtype(dtype)
+        if dtype.name not in WEIGHT_DTYPES:
+            raise ValueError("Unsupported weight dtype: {}".format(dtype))
+        if dtype.name == "float64":
+            return cls(np.zeros((N, N)))
+        return cls(np.zeros((N, N), dtype=dtype), scale=1.0 / N)
+
+    def local_field(self, S, xi):  # S: single state (N,) or batch (B, N)
+        if self.w.dtype.kind == "f":  # float32 stays in single precision
+            S = S.astype(self.w.dtype)
+            if len(S.shape) == 1:
+                h = np.dot(self.w, S)
+            else:
+                h = np.dot(S, self.w.T)  # one matrix-matrix product for all states
+            return h.astype("float64", copy=False)
+        # integer counts, cast blocks of rows to float64 for exact BLAS products
+        S = S.astype("float64")
+        h = np.empty(S.shape)
+        for rows in row_blocks(self.w.shape[0]):
+            w_rows = self.w[rows].astype("float64")
+            if len(S.shape) == 1:
+                h[rows] = np.dot(w_rows, S)
+            else:
+                h[:, rows] = np.dot(S, w_rows.T)
+        return h
+
+    def row(self, i, xi):  # row i (N,) or rows of the indices i (m, N)
+        return self.w[i, :].astype("float64", copy=False)
+
+    def add_row(self, h, i, factor, xi):  # h += factor * row(i)
+        h += factor * self.row(i, xi)
+
+    def add_patterns(self, xi_new):
+        self.update_patterns(xi_new=xi_new)
+
+    def remove_patterns(self, xi_old, indices=None):
+        self.update_patterns(xi_old=xi_old, indices=indices)
+
+    def update_patterns(self, xi_new=None, xi_old=None, indices=None, new_indices=None):
+        # trains xi_new and removes xi_old in a single pass over w. indices are
+        # the positions of xi_old among the saved patterns, new_indices those
+        # of xi_new afterwards (None: appended), for weights with state per
+        # pattern.
+        N = self.w.shape[0]
+        xi_new = np.empty((N, 0)) if xi_new is None else xi_new.reshape(N, -1)
+        xi_old = np.empty((N, 0)) if xi_old is None else xi_old.reshape(N, -1)
+        k_new, k_old = xi_new.shape[1], xi_old.shape[1]
+        n_patterns = max(self.n_patterns + k_new - k_old, 0)
+        if self.w.dtype.kind == "i":
+            if n_patterns > np.iinfo(self.w.dtype).max:
+                raise ValueError(
+                    "Too many patterns for weight dtype {}".format(self.w.dtype)
+                )
+        self.n_patterns = n_patterns
+        if k_new + k_old == 0:
+            return
+        sign = np.repeat([1, -1], [k_new, k_old])
+        add_hebb_matrix(
+            self.w, np.hstack((xi_new, xi_old)), self.normalization, sign=sign
+        )
+
+    @property
+    def normalization(self):
+        return self.w.shape[0] if self.w.dtype.name == "float64" else 1
+
+    def to_array(self, xi):
+        if self.w.dtype.name == "float64":
+            return self.w
+        return self.scale * self.w
+
+    @property
+    def nbytes(self):
+        return self.w.nbytes
+
+
+class StorkeyWeights(DenseWeights):  # Storkey's incremental learning rule
+    downdates = False  # removing patterns means to train the others again
+
+    def update_patterns(self, xi_new=None, xi_old=None, indices=None, new_indices=None):
+        # w += (xi xi^T - xi h^T - h xi^T + 2 w) / N for one pattern after the
+        # other, with h = w xi, in place and in blocks of rows
+        if xi_old is not None and xi_old.size != 0:
+            raise ValueError("Storkey weights cannot forget single patterns.")
+        if xi_new is None:
+            return
+        N = self.w.shape[0]
+        for xi in xi_new.reshape(N, -1).T.astype("float64"):
+            h = np.dot(self.w, xi)
+            for rows in row_blocks(N):
+                block = np.outer(xi[rows], xi)
+                block -= np.outer(xi[rows], h)
+                block -= np.outer(h[rows], xi)
+                block += 2 * self.w[rows]
+                block /= N
+                block[
+                    np.arange(rows.stop - rows.start), np.arange(rows.start, rows.stop)
+                ] = 0
+                self.w[rows] += block
+            self.n_patterns += 1
+
+
+class PseudoInverseWeights(DenseWeights):  # projection rule w = xi xi^+
+    # The projector P onto the span of the patterns is kept as w with zero
+    # diagonal plus its diagonal. Every pattern changes P and the
+    # pseudo-inverse xi^+ = (xi^T xi)^-1 xi^T by rank-1 updates (Greville),
+    # so training or removing a pattern costs O(N^2 + p N) instead of
+    # inverting the correlation matrix xi^T xi again. The rows of pinv follow
+    # the order of the saved patterns, a pattern which depends linearly on
+    # the others has a zero row. Removing a direction which dependent
+    # patterns may still span needs a new training (downdates is False).
+
+    def __init__(self, w, scale=1.0, n_patterns=0):
+        DenseWeights.__init__(self, w, scale, n_patterns)
+        self.diagonal = np.zeros(w.shape[0])  # diagonal of P
+        self.pinv = np.zeros((0, w.shape[0]))  # rows of xi^+ in pattern order
+        self.n_dependent = 0  # patterns with a zero row
+
+    @property
+    def downdates(self):
+        return self.n_dependent == 0
+
+    def update_patterns(self, xi_new=None, xi_old=None, indices=None, new_indices=None):
+        N = self.w.shape[0]
+        if xi_old is not None:
+            xi_old = xi_old.reshape(N, -1).T.astype("float64")
+            if indices is None:  # xi^+ xi_k is the unit vector e_k
+                indices = [np.argmax(np.dot(self.pinv, xi)) for xi in xi_old]
+            for k in np.argsort(indices)[::-1]:  # the rows before keep their index
+                self.remove_pattern(xi_old[k], indices[k])
+        if xi_new is not None:
+            xi_new = xi_new.reshape(N, -1).T.astype("float64")
+            for xi in xi_new:
+                self.add_pattern(xi)
+            if new_indices is not None:  # move the new rows to their patterns
+                p, k = self.pinv.shape[0], xi_new.shape[0]
+                order = np.empty(p, dtype="int64")
+                old = np.ones(p, dtype="bool")
+                old[new_indices] = False
+                order[new_indices] = np.arange(p - k, p)
+                order[old] = np.arange(p - k)
+                self.pinv = self.pinv[order]
+
+    def add_pattern(self, xi):
+        r = xi - np.dot(self.w, xi) - self.diagonal * xi  # xi - P xi
+        d = np.dot(r, r)
+        self.n_patterns += 1
+        if d < 1e-9 * self.w.shape[0]:  # linearly dependent, P stays the same
+            self.pinv = np.vstack((self.pinv, np.zeros(self.w.shape[0])))
+            self.n_dependent += 1
+            return
+        self.pinv -= np.outer(np.dot(self.pinv, xi), r / d)
+        self.pinv = np.vstack((self.pinv, r / d))
+        add_hebb_matrix(self.w, r, d)
+        self.diagonal += r * r / d
+
+    def remove_pattern(self, xi, k):  # xi: pattern k
+        u = self.pinv[k]
+        self.pinv = np.delete(self.pinv, k, axis=0)
+        self.n_patterns = max(self.n_patterns - 1, 0)
+        uu = np.dot(u, u)
+        if uu == 0:  # dependent, the others still span the same space
+            self.n_dependent -= 1
+            return
+        add_hebb_matrix(self.w, u, uu, sign=-1)
+        self.diagonal -= u * u / uu
+        self.pinv -= np.outer(np.dot(self.pinv, u), u / uu)
+
+
+# dense weights of the learning rules, HopfieldNetwork(rule=...)
+LEARNING_RULES = {
+    "hebb": DenseWeights,
+    "storkey": StorkeyWeights,
+    "pseudoinverse": PseudoInverseWeights,
+}
+
+
+class LowRankWeights(object):  # w = xi xi^T / N - p / N, never materialized
+    storage = "lowrank"
+    downdates = True
+
+    def __init__(self, N):
+        self.N = N
+        self.scale = 1.0 / N
+        self.xi_float = None  # cached float copy of xi for BLAS products
+
+    def local_field(self, S, xi):  # S: single state (N,) or batch (B, N)
+        xi_float = self.float_patterns(xi)
+        p = xi.shape[1]  # diagonal of xi xi^T for patterns with +-1 entries
+        if len(S.shape) == 1:
+            h = np.dot(xi_float, np.dot(S, xi_float))
+        else:
+            h = np.dot(np.dot(S, xi_float), xi_float.T)
+        h -= p * S.astype("float64")
+        return h
+
+    def row(self, i, xi):  # row i (N,) or rows of the indices i (m, N)
+        xi_float = self.float_patterns(xi)
+        if np.ndim(i) == 0:
+            w_i = np.dot(xi_float, xi_float[i])
+            w_i[i] = 0
+        else:
+            w_i = np.dot(xi_float[i], xi_float.T)
+            w_i[np.arange(len(i)), i] = 0
+        return w_i
+
+    def add_row(self, h, i, factor, xi):  # h += factor * row(i)
+        h += factor * self.row(i, xi)
+
+    def add_patterns(self, xi_new):
+        self.xi_float = None
+
+    def remove_patterns(self, xi_old, indices=None):
+        self.xi_float = None
+
+    def update_patterns(self, xi_new=None, xi_old=None, indices=None, new_indices=None):
+        self.xi_float = None
+
+    def float_patterns(self, xi):
+        if self.xi_float is None or self.xi_float.shape != xi.shape:
+            self.xi_float = xi.astype("float64")
+        return self.xi_float
+
+    def to_array(self, xi):
+        w = np.zeros((self.N, self.N))
+        add_hebb_matrix(w, xi, self.N)
+        return w
+
+    @property
+    def nbytes(self):
+        return 0 if self.xi_float is None else self.xi_float.nbytes
+
+
+class SparseWeights(object):  # diluted couplings in CSR format
+    storage = "sparse"
+    downdates = True
+
+    # Neuron i is connected to the neurons indices[indptr[i]:indptr[i + 1]]
+    # (symmetric, sorted, without i itself) with the Hebbian counts in data.
+    # The physical weights are data / k for the mean number k of connections,
+    # so memory and the cost of a local field grow with N * k.
+
+    def __init__(self, indptr, indices, data, n_patterns=0):
+        self.indptr = indptr
+        self.indices = indices
+        self.data = data
+        self.n_patterns = n_patterns
+        N = indptr.shape[0] - 1
+        self.scale = N / max(indices.shape[0], 1)  # 1 / mean connectivity
+        nonempty = np.flatnonzero(np.diff(indptr))
+        self.starts = indptr[nonempty]  # segments of the rows for reduceat
+        self.nonempty = nonempty
+
+    @classmethod
+    def zeros(cls, connectivity, dtype="float64"):
+        dtype = np.dtype(dtype)
+        if dtype.name not in WEIGHT_DTYPES:
+            raise ValueError("Unsupported weight dtype: {}".format(dtype))
+        indptr, indices = connectivity
+        return cls(indptr, indices, np.zeros(indices.shape[0], dtype=dtype))
+
+    def local_field(self, S, xi):  # S: single state (N,) or batch (B, N)
+        h = np.zeros(S.shape)
+        if self.starts.size != 0:
+            products = S[..., self.indices].astype("float64")
+            products *= self.data
+            h[..., self.nonempty] = np.add.reduceat(products, self.starts, axis=-1)
+        return h
+
+    def row(self, i, xi):  # row i (N,) or rows of the indices i (m, N)
+        N = self.indptr.shape[0] - 1
+        if np.ndim(i) == 0:
+            w_i = np.zeros(N)
+            segment = slice(self.indptr[i], self.indptr[i + 1])
+            w_i[self.indices[segment]] = self.data[segment]
+            return w_i
+        starts, lengths = self.indptr[i], self.indptr[i + 1] - self.indptr[i]
+        rows = np.repeat(np.arange(len(i)), lengths)
+        segments = np.arange(lengths.sum()) + np.repeat(
+            starts - np.cumsum(lengths) + lengths, lengths
+        )
+        w_i = np.zeros((len(i), N))
+        w_i[rows, self.indices[segments]] = self.data[segments]
+        return w_i
+
+    def add_row(self, h, i, factor, xi):  # h += factor * row(i) in O(k)
+        segment = slice(self.indptr[i], self.indptr[i + 1])
+        h[self.indices[segment]] += factor * self.data[segment]
+
+    def add_patterns(self, xi_new):
+        self.update_patterns(xi_new=xi_new)
+
+    def remove_patterns(self, xi_old, indices=None):
+        self.update_patterns(xi_old=xi_old)
+
+    def update_patterns(self, xi_new=None, xi_old=None, indices=None, new_indices=None):
+        # Hebbian learning restricted to the connections, in blocks of entries
+        N = self.indptr.shape[0] - 1
+        xi_new = np.empty((N, 0)) if xi_new is None else xi_new.reshape(N, -1)
+        xi_old = np.empty((N, 0)) if xi_old is None else xi_old.reshape(N, -1)
+        k_new, k_old = xi_new.shape[1], xi_old.shape[1]
+        n_patterns = max(self.n_patterns + k_new - k_old, 0)
+        if self.data.dtype.kind == "i":
+            if n_patterns > np.iinfo(self.data.dtype).max:
+                raise ValueError(
+                    "Too many patterns for weight dtype {}".format(self.data.dtype)
+                )
+        self.n_patterns = n_patterns
+        if k_new + k_old == 0:
+            return
+        xi = np.hstack((xi_new, xi_old)).astype("float64")
+        xi_signed = xi * np.repeat([1, -1], [k_new, k_old])
+        n_entries = max(1, BLOCK_BYTES // (8 * xi.shape[1]))
+        for a in range(0, self.indices.shape[0], n_entries):
+            entries = np.arange(a, min(a + n_entries, self.indices.shape[0]))
+            rows = np.searchsorted(self.indptr, entries, side="right") - 1
+            counts = np.einsum("ek,ek->e", xi_signed[rows], xi[self.indices[entries]])
+            self.data[entries] += counts.astype(self.data.dtype, copy=False)
+
+    def to_array(self, xi):
+        N = self.indptr.shape[0] - 1
+        w = np.zeros((N, N))
+        rows = np.repeat(np.arange(N), np.diff(self.indptr))
+        w[rows, self.indices] = self.scale * self.data
+        return w
+
+    @property
+    def nbytes(self):
+        return self.indptr.nbytes + self.indices.nbytes + self.data.nbytes
+
+
+def random_connectivity(N, k, seed=None):
+    # symmetric random graph in which every neuron has about k connections,
+    # returns the CSR arrays (indptr, indices)
+    rng = np.random.default_rng(seed)
+    i = np.repeat(np.arange(N, dtype="int64"), k // 2)
+    j = (i + rng.integers(1, N, size=i.shape[0])) % N  # never i itself
+    return csr_connectivity(N, np.concatenate((i, j)), np.concatenate((j, i)))
+
+
+def lattice_connectivity(shape, radius=1):
+    # neurons of a 2D image (height, width) in row-major order, as flattened
+    # by image2numpy_array, connected to all neurons within radius pixels
+    # (square neighbourhood), returns the CSR arrays (indptr, indices)
+    height, width = shape
+    y, x = np.divmod(np.arange(height * width), width)
+    i_vec, j_vec = [], []
+    for dy in range(-radius, radius + 1):
+        for dx in range(-radius, radius + 1):
+            if dy == 0 and dx == 0:
+                continue
+            inside = (
+                (y + dy >= 0) & (y + dy < height) & (x + dx >= 0) & (x + dx < width)
+            )
+            i_vec.append(np.flatnonzero(inside))
+            j_vec.append(i_vec[-1] + dy * width + dx)
+    return csr_connectivity(
+        height * width, np.concatenate(i_vec), np.concatenate(j_vec)
+    )
+
+
+def csr_connectivity(N, i, j):  # CSR arrays of the unique connections i -> j
+    pairs = np.sort(i.astype("int64") * N + j)
+    pairs = pairs[np.concatenate(([True], pairs[1:] != pairs[:-1]))]  # unique
+    i, j = np.divmod(pairs, N)
+    indptr = np.zeros(N + 1, dtype="int64")
+    np.cumsum(np.bincount(i, minlength=N), out=indptr[1:])
+    index_dtype = "int32" if N < 2**31 else "int64"
+    return indptr, j.astype(index_dtype)
+
+
+def row_blocks(N):  # slices of rows with float64 blocks of about BLOCK_BYTES
+    n_rows = max(1, BLOCK_BYTES // (8 * N))
+    return [slice(a, min(a + n_rows, N)) for a in range(0, N, n_rows)]
+
+
+def add_hebb_matrix(w, xi, n=1, sign=1):
+    # w += xi diag(sign) xi^T / n with zero diagonal, in place and in blocks
+    # of rows, so the temporaries stay small compared with w. sign is +-1 for
+    # all patterns or per pattern, to add and subtract patterns in one pass.
+    N = w.shape[0]
+    xi = xi.reshape(N, -1).astype("float64")
+    xi_signed = xi * np.broadcast_to(sign, xi.shape[1:])
+    for rows in row_blocks(N):
+        block = np.dot(xi_signed[rows], xi.T)
+        if n != 1:
+            block /= n
+        block[np.arange(rows.stop - rows.start), np.arange(rows.start, rows.stop)] = 0
+        w[rows] += block.astype(w.dtype, copy=False)
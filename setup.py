@@ -19,19 +19,23 @@ setup(
     author=about["__author__"],
     license=about["__license__"],
     packages=find_packages(),
-    install_requires=["numpy", "matplotlib", "pillow"],
-    python_requires=">=2.7",
+    install_requires=["numpy>=1.17", "matplotlib", "pillow"],
+    python_requires=">=3.7",
     package_data={
         "hopfieldnetwork": ["data/**/*"],
     },
     entry_points={
-        "console_scripts": ["hopfieldnetwork-ui=hopfieldnetwork.gui:start_gui"]
+        "console_scripts": [
+            "hopfieldnetwork-ui=hopfieldnetwork.gui:start_gui",
+            "hopfieldnetwork-server=hopfieldnetwork.server:main",
+        ]
     },
     classifiers=[
         "Development Status :: 5 - Production/Stable",
         "Intended Audience :: Science/Research",
         "License :: OSI Approved :: GNU General Public License v3 (GPLv3)",
         "Programming Language :: Python",
+        "Programming Language :: Python :: 3",
         "Topic :: Scientific/Engineering",
     ],
 )